@@ -1,12 +1,60 @@
 import motor.motor_asyncio
 import logging
-from datetime import datetime, date
+import time
+from collections import OrderedDict
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime, date, timedelta
 from typing import List, Optional
 from config import *
 
 logging.basicConfig(level=logging.INFO)
 
 
+class TTLCache:
+    """
+    Small in-process LRU cache whose entries also expire after `ttl` seconds.
+    Used write-through by Master for per-user preferences.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()  # key → (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return (found, value)."""
+        item = self.data.get(key)
+        if item is not None:
+            if item[0] > time.monotonic():
+                self.data.move_to_end(key)
+                self.hits += 1
+                return True, item[1]
+            del self.data[key]
+        self.misses += 1
+        return False, None
+
+    def set(self, key, value, ttl: float = None):
+        self.data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
 class Master:
     def __init__(self, DB_URL, DB_NAME):
         self.dbclient = motor.motor_asyncio.AsyncIOMotorClient(DB_URL)
@@ -25,9 +73,24 @@ class Master:
         # Per-user sorting mode storage
         self.sequence_mode = self.database['sequence_mode']
 
+        # Send rates learned from FloodWaits, per target chat
+        self.send_rates = self.database['send_rates']
+
+        # In-progress /ssequence sessions, so they survive restarts
+        self.sequence_sessions = self.database['sequence_sessions']
+
+        # Broadcast jobs and their checkpoints, so a restart can resume them
+        self.broadcasts = self.database['broadcasts']
+
         # Backward compatibility alias
         self.col = self.user_data
 
+        # Write-through cache for sequence mode / delivery mode / dump channel
+        self.pref_cache = TTLCache(PREF_CACHE_SIZE, PREF_CACHE_TTL)
+
+        # Force-sub channel list and modes, invalidated by the setters below
+        self.fsub_cache = TTLCache(1024, FSUB_CHANNEL_TTL)
+
     def new_user(self, id, username=None):
         return dict(
             _id=int(id),
@@ -70,26 +133,119 @@ class Master:
     async def delete_user(self, user_id):
         await self.user_data.delete_one({"_id": int(user_id)})
 
+    def iter_user_ids(self, batch_size: int = 1000, after=None):
+        """Cursor over user ids only, in _id order, optionally starting after `after`."""
+        query = {"_id": {"$gt": after}} if after is not None else {}
+        return self.user_data.find(query, {"_id": 1}).sort("_id", 1).batch_size(batch_size)
+
+    async def delete_users(self, user_ids) -> int:
+        """Remove many users in one round trip."""
+        if not user_ids:
+            return 0
+        try:
+            result = await self.user_data.bulk_write(
+                [DeleteOne({"_id": int(user_id)}) for user_id in user_ids], ordered=False
+            )
+            return result.deleted_count
+        except Exception as e:
+            logging.error(f"Error deleting {len(user_ids)} users: {e}")
+            return 0
+
     async def is_user_banned(self, user_id):
         try:
             user = await self.ban_data.find_one({"_id": int(user_id)})
             if user:
                 ban_status = user.get("ban_status", {})
-                return ban_status.get("is_banned", False)
+                if not ban_status.get("is_banned", False):
+                    return False
+                expires = self.ban_expiry(ban_status)
+                return expires is None or expires > datetime.now()
             return False
         except Exception as e:
             logging.error(f"Error checking if user {user_id} is banned: {e}")
             return False
 
+    @staticmethod
+    def ban_expiry(ban_status: dict) -> Optional[datetime]:
+        """When a ban lifts: banned_on + ban_duration seconds, or None if it is permanent."""
+        duration = ban_status.get("ban_duration") or 0
+        if duration <= 0:
+            return None
+        try:
+            return datetime.fromisoformat(ban_status["banned_on"]) + timedelta(seconds=duration)
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    async def get_banned_users(self) -> Optional[List[dict]]:
+        """All users currently marked as banned, with their ban_status; None if the read failed."""
+        try:
+            return await self.ban_data.find(
+                {"ban_status.is_banned": True}, {"ban_status": 1}
+            ).to_list(None)
+        except Exception as e:
+            logging.error(f"Error loading banned users: {e}")
+            return None
+
+    async def ban_user(self, user_id: int, reason: str, duration: int = 0) -> bool:
+        """Ban a user; `duration` is in seconds, 0 for a permanent ban."""
+        try:
+            await self.ban_data.update_one(
+                {"_id": int(user_id)},
+                {"$set": {
+                    "ban_status.is_banned": True,
+                    "ban_status.ban_reason": reason,
+                    "ban_status.ban_duration": int(duration),
+                    "ban_status.banned_on": datetime.now().isoformat(timespec="seconds")
+                }},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            logging.error(f"Error banning user {user_id}: {e}")
+            return False
+
+    async def unban_user(self, user_id: int) -> bool:
+        try:
+            await self.ban_data.update_one(
+                {"_id": int(user_id)},
+                {"$set": {
+                    "ban_status.is_banned": False,
+                    "ban_status.ban_reason": "",
+                    "ban_status.ban_duration": 0,
+                    "ban_status.banned_on": None
+                }}
+            )
+            return True
+        except Exception as e:
+            logging.error(f"Error unbanning user {user_id}: {e}")
+            return False
+
+    async def lift_bans(self, user_ids: List[int]) -> int:
+        """Mark timed bans that have run out as lifted."""
+        if not user_ids:
+            return 0
+        try:
+            result = await self.ban_data.update_many(
+                {"_id": {"$in": [int(u) for u in user_ids]}},
+                {"$set": {"ban_status.is_banned": False, "ban_status.ban_duration": 0}}
+            )
+            return result.modified_count
+        except Exception as e:
+            logging.error(f"Error lifting expired bans: {e}")
+            return 0
+
     # ==================== DUMP CHANNEL (Per User) ====================
 
     async def get_dump_channel(self, user_id: int) -> Optional[int]:
         """Get user's saved dump channel ID. Returns int or None."""
+        found, channel = self.pref_cache.get(("dump", int(user_id)))
+        if found:
+            return channel
         try:
             doc = await self.user_data.find_one({"_id": int(user_id)}, {"dump_channel": 1})
-            if doc and doc.get("dump_channel"):
-                return int(doc["dump_channel"])
-            return None
+            channel = int(doc["dump_channel"]) if doc and doc.get("dump_channel") else None
+            self.pref_cache.set(("dump", int(user_id)), channel)
+            return channel
         except Exception as e:
             logging.error(f"Error getting dump_channel for {user_id}: {e}")
             return None
@@ -107,6 +263,7 @@ class Master:
                 },
                 upsert=True
             )
+            self.pref_cache.set(("dump", int(user_id)), int(channel_id))
             logging.info(f"Dump channel set for {user_id} → {channel_id}")
             return True
         except Exception as e:
@@ -120,6 +277,7 @@ class Master:
                 {"_id": int(user_id)},
                 {"$unset": {"dump_channel": "", "dump_channel_updated_at": ""}}
             )
+            self.pref_cache.set(("dump", int(user_id)), None)
             if result.modified_count > 0:
                 logging.info(f"Dump channel removed for user {user_id}")
                 return True
@@ -135,14 +293,17 @@ class Master:
         Get user's preferred sorting mode.
         Default: "All"
         """
+        found, mode = self.pref_cache.get(("mode", int(user_id)))
+        if found:
+            return mode
         try:
             doc = await self.sequence_mode.find_one({"_id": int(user_id)})
-            if doc and "mode" in doc:
-                mode = doc["mode"]
-                # All currently supported modes
-                if mode in ["Quality", "All", "AllSQE", "Episode", "Season"]:
-                    return mode
-            return "All"  # Default when no document or invalid value
+            mode = doc.get("mode") if doc else None
+            # All currently supported modes; default when no document or invalid value
+            if mode not in ["Quality", "All", "AllSQE", "Episode", "Season"]:
+                mode = "All"
+            self.pref_cache.set(("mode", int(user_id)), mode)
+            return mode
         except Exception as e:
             logging.error(f"Error getting sequence_mode for {user_id}: {e}")
             return "All"
@@ -169,12 +330,187 @@ class Master:
                 },
                 upsert=True
             )
+            self.pref_cache.set(("mode", int(user_id)), mode)
             logging.info(f"Sequence mode updated: {user_id} → {mode}")
             return True
         except Exception as e:
             logging.error(f"Error setting sequence_mode for {user_id}: {e}")
             return False
 
+    # ==================== DELIVERY MODE (Send Preference) ====================
+
+    async def get_delivery_mode(self, user_id: int) -> str:
+        """
+        Get how the user's sequences are delivered.
+        Default: "single"
+        """
+        found, mode = self.pref_cache.get(("delivery", int(user_id)))
+        if found:
+            return mode
+        try:
+            doc = await self.user_data.find_one({"_id": int(user_id)}, {"delivery_mode": 1})
+            mode = doc.get("delivery_mode") if doc else None
+            if mode not in ["single", "album", "copy"]:
+                mode = "single"
+            self.pref_cache.set(("delivery", int(user_id)), mode)
+            return mode
+        except Exception as e:
+            logging.error(f"Error getting delivery_mode for {user_id}: {e}")
+            return "single"
+
+    async def set_delivery_mode(self, user_id: int, mode: str) -> bool:
+        """
+        Save user's delivery preference.
+        Supported modes: single, album, copy
+        """
+        if mode not in {"single", "album", "copy"}:
+            logging.warning(f"Attempted to set invalid delivery mode '{mode}' for user {user_id}")
+            return False
+
+        try:
+            await self.user_data.update_one(
+                {"_id": int(user_id)},
+                {"$set": {"delivery_mode": mode}},
+                upsert=True
+            )
+            self.pref_cache.set(("delivery", int(user_id)), mode)
+            logging.info(f"Delivery mode updated: {user_id} → {mode}")
+            return True
+        except Exception as e:
+            logging.error(f"Error setting delivery_mode for {user_id}: {e}")
+            return False
+
+    # ==================== SEQUENCE SESSIONS ====================
+
+    async def get_sequence_session(self, user_id: int) -> Optional[dict]:
+        try:
+            return await self.sequence_sessions.find_one({"_id": int(user_id)})
+        except Exception as e:
+            logging.error(f"Error loading sequence session for {user_id}: {e}")
+            return None
+
+    async def get_sequence_session_ids(self) -> list:
+        cursor = self.sequence_sessions.find({}, {"_id": 1})
+        return [doc["_id"] for doc in await cursor.to_list(None)]
+
+    async def save_sequence_sessions(self, changes: dict) -> set:
+        """
+        Apply buffered session changes in one bulk write.
+        changes: {user_id: {'reset', 'delete', 'mode', 'files'}}
+        Returns the user ids whose change was not applied (empty on success).
+        The write is unordered, so after a BulkWriteError only the ops it
+        reports failed; any other error leaves every change unapplied.
+        """
+        ops, owners = [], []
+        now = datetime.utcnow()
+        for user_id, change in changes.items():
+            owners.append(user_id)
+            if change['delete']:
+                ops.append(DeleteOne({"_id": int(user_id)}))
+            elif change['reset']:
+                ops.append(ReplaceOne(
+                    {"_id": int(user_id)},
+                    {"mode": change['mode'], "files": change['files'], "updated_at": now},
+                    upsert=True
+                ))
+            elif change['files']:
+                ops.append(UpdateOne(
+                    {"_id": int(user_id)},
+                    {"$push": {"files": {"$each": change['files']}}, "$set": {"updated_at": now}}
+                ))
+            else:
+                owners.pop()
+        if not ops:
+            return set()
+        try:
+            await self.sequence_sessions.bulk_write(ops, ordered=False)
+            return set()
+        except BulkWriteError as e:
+            failed = {owners[error['index']] for error in e.details.get('writeErrors', [])}
+            logging.error(f"Error saving sequence sessions: {len(failed)} of {len(ops)} change(s) failed")
+            return failed
+        except Exception as e:
+            logging.error(f"Error saving sequence sessions: {e}")
+            return set(owners)
+
+    # ==================== LEADERBOARD ====================
+
+    async def ensure_indexes(self):
+        """Indexes the bot's queries rely on; cheap no-op when they exist."""
+        try:
+            await self.user_data.create_index([("sequence_count", -1)])
+        except Exception as e:
+            logging.error(f"Error creating indexes: {e}")
+
+    async def get_sequence_counts(self) -> Optional[list]:
+        """Every user who has sequenced files, with their count and mention; None on error."""
+        try:
+            return await self.user_data.find(
+                {"sequence_count": {"$gt": 0}},
+                {"sequence_count": 1, "mention": 1}
+            ).to_list(None)
+        except Exception as e:
+            logging.error(f"Error loading sequence counts: {e}")
+            return None
+
+    # ==================== LEARNED SEND RATES ====================
+
+    async def get_send_rates(self) -> list:
+        try:
+            return await self.send_rates.find({}).to_list(None)
+        except Exception as e:
+            logging.error(f"Error loading send rates: {e}")
+            return []
+
+    async def save_send_rates(self, rates: dict) -> bool:
+        """
+        Bulk-save learned rates: {chat_id: {'rate', 'default'} or None}.
+        None means the chat is back at its default rate and is dropped.
+        """
+        ops = []
+        for chat_id, entry in rates.items():
+            if entry is None:
+                ops.append(DeleteOne({"_id": chat_id}))
+            else:
+                ops.append(UpdateOne(
+                    {"_id": chat_id},
+                    {"$set": {"rate": entry["rate"], "default": entry["default"], "updated_at": datetime.utcnow()}},
+                    upsert=True
+                ))
+        if not ops:
+            return True
+        try:
+            await self.send_rates.bulk_write(ops, ordered=False)
+            return True
+        except Exception as e:
+            logging.error(f"Error saving send rates: {e}")
+            return False
+
+    # ==================== BROADCAST JOBS ====================
+
+    async def save_broadcast(self, job_id: str, fields: dict) -> bool:
+        """Upsert a broadcast job's status and checkpoint."""
+        try:
+            await self.broadcasts.update_one(
+                {"_id": job_id},
+                {"$set": {**fields, "updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            logging.error(f"Error saving broadcast {job_id}: {e}")
+            return False
+
+    async def get_unfinished_broadcasts(self) -> list:
+        """Jobs that were running or paused when the bot last stopped."""
+        try:
+            return await self.broadcasts.find(
+                {"status": {"$in": ["running", "paused"]}}
+            ).to_list(None)
+        except Exception as e:
+            logging.error(f"Error loading broadcasts: {e}")
+            return []
+
     # ==================== ADMIN FUNCTIONS ====================
 
     async def is_admin(self, user_id: int) -> bool:
@@ -209,6 +545,8 @@ class Master:
                 {"$set": {"channel_id": channel_id, "created_at": datetime.utcnow(), "status": "active", "mode": "off"}},
                 upsert=True
             )
+            self.fsub_cache.delete("channels")
+            self.fsub_cache.set(("mode", channel_id), "off")
             return True
         except Exception as e:
             logging.error(f"Error adding FSub channel {channel_id}: {e}")
@@ -216,20 +554,35 @@ class Master:
 
     async def remove_fsub_channel(self, channel_id: int) -> bool:
         result = await self.fsub_data.delete_one({"channel_id": channel_id})
+        self.fsub_cache.delete("channels")
+        self.fsub_cache.delete(("mode", channel_id))
         return result.deleted_count > 0
 
     async def get_fsub_channels(self) -> List[int]:
+        found, channels = self.fsub_cache.get("channels")
+        if found:
+            return list(channels)
         cursor = self.fsub_data.find({"status": "active"})
-        channels = await cursor.to_list(None)
-        return [ch["channel_id"] for ch in channels if "channel_id" in ch]
+        docs = await cursor.to_list(None)
+        channels = [ch["channel_id"] for ch in docs if "channel_id" in ch]
+        self.fsub_cache.set("channels", tuple(channels))
+        for ch in docs:
+            if "channel_id" in ch:
+                self.fsub_cache.set(("mode", ch["channel_id"]), ch.get("mode", "off"))
+        return channels
 
     async def show_channels(self) -> List[int]:
         """Alias for get_fsub_channels for backward compatibility"""
         return await self.get_fsub_channels()
 
     async def get_channel_mode(self, channel_id: int) -> str:
+        found, mode = self.fsub_cache.get(("mode", channel_id))
+        if found:
+            return mode
         data = await self.fsub_data.find_one({'channel_id': channel_id})
-        return data.get("mode", "off") if data else "off"
+        mode = data.get("mode", "off") if data else "off"
+        self.fsub_cache.set(("mode", channel_id), mode)
+        return mode
 
     async def get_channel_mode_all(self, channel_id: int) -> str:
         """Alias for get_channel_mode for backward compatibility"""
@@ -241,6 +594,7 @@ class Master:
             {'$set': {'mode': mode}},
             upsert=True
         )
+        self.fsub_cache.set(("mode", channel_id), mode)
 
     # Request ForceSub helpers
     async def req_user(self, channel_id: int, user_id: int):
@@ -2,20 +2,42 @@ import re
 import asyncio
 import logging
 from pyrogram import Client, filters
-from pyrogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup
+from pyrogram.types import (
+    Message, InlineKeyboardButton, InlineKeyboardMarkup,
+    InputMediaDocument, InputMediaVideo, InputMediaAudio
+)
 from pyrogram.errors import FloodWait, MessageNotModified
 from pyrogram.enums import ParseMode
 from datetime import datetime
+from functools import lru_cache, partial
+from operator import attrgetter
+from sys import intern
+from bisect import insort
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # optional, only used for very large batches
+    np = None
 
 from config import *
-from Plugins.callbacks import MODES  # ← Import MODES from callbacks.py (recommended)
+from Plugins.callbacks import MODES, DELIVERY_MODES, get_delivery_keyboard  # ← Import MODES from callbacks.py (recommended)
 from Database.database import Seishiro
 from Plugins.start import *
+from Plugins.leaderboard import leaderboard
+from Plugins.metrics import Gauge, FLOODWAIT_SLEPT
+from Plugins.tracing import span
+from Plugins.scheduler import send_scheduler
+from Plugins.sessions import session_store
+from Plugins.timers import timer_wheel
 
 logger = logging.getLogger(__name__)
 
-user_sessions = {}          # Only for active file lists (mode is now from DB)
-pending_notifications = {}  # user_id → {'timer': asyncio.Task, 'last_count': int}
+user_sessions = {}          # user_id → {'files': SequenceIndex}, persisted through session_store
+pending_notifications = {}  # user_id → {'timer': Timer, 'last_count': int}
+
+Gauge("bot_active_sessions", "Open /ssequence sessions", lambda: len(user_sessions))
+Gauge("bot_queued_files", "Files collected in open sessions", lambda: sum(len(s['files']) for s in user_sessions.values()))
 
 # ==================== FLOODWAIT HANDLER ====================
 
@@ -26,6 +48,7 @@ async def handle_floodwait(func, *args, **kwargs):
             return await func(*args, **kwargs)
         except FloodWait as e:
             logger.warning(f"FloodWait: Sleeping for {e.value} seconds...")
+            FLOODWAIT_SLEPT.inc("handle_floodwait", amount=e.value + 1)
             await asyncio.sleep(e.value + 1)
         except MessageNotModified:
             break
@@ -35,31 +58,166 @@ async def handle_floodwait(func, *args, **kwargs):
 
 # ==================== FILE PARSING & SORTING ====================
 
-def extract_file_info(filename, file_format, file_id=None):
-    quality_match = re.search(QUALITY_PATTERN, filename, re.IGNORECASE)
-    quality = quality_match.group(1).lower() if quality_match else 'unknown'
+class FileInfoParser:
+    """
+    Filename parser with patterns compiled once and results memoized.
 
-    temp = re.sub(QUALITY_PATTERN, '', filename, flags=re.IGNORECASE) if quality_match else filename
+    Season and episode are pulled out in a single scan of the
+    quality-stripped name, and the (season, episode, quality) result is
+    cached in a bounded LRU keyed by filename, so re-uploads of the same
+    release names are free.
+    """
+
+    def __init__(self, maxsize=PARSER_CACHE_SIZE):
+        self.quality_re = re.compile(QUALITY_PATTERN, re.IGNORECASE)
+        # Season and episode tokens can never overlap, so the first hit of
+        # each alternative is the same as a separate re.search per pattern.
+        self.tag_re = re.compile(f"(?P<season>{SEASON_PATTERN})|(?P<episode>{EPISODE_PATTERN})")
+        self.num_re = re.compile(r'\d{1,3}')
+        self.parse = lru_cache(maxsize=maxsize)(self._parse)
+
+    def _parse(self, filename):
+        quality_match = self.quality_re.search(filename)
+        if quality_match:
+            quality = quality_match.group(1).lower()
+            temp = filename[:quality_match.start()] + self.quality_re.sub('', filename[quality_match.end():])
+        else:
+            quality = 'unknown'
+            temp = filename
 
-    season_match = re.search(SEASON_PATTERN, temp)
-    season = int(season_match.group(1)) if season_match else 0
+        season = episode = None
+        for match in self.tag_re.finditer(temp):
+            if match.lastgroup == 'season':
+                if season is None:
+                    season = int(match.group(2))
+            elif episode is None:
+                episode = int(match.group(4))
+            if season is not None and episode is not None:
+                break
 
-    episode_match = re.search(EPISODE_PATTERN, temp)
-    episode = int(episode_match.group(1)) if episode_match else 0
-    if not episode_match:
-        nums = re.findall(r'\d{1,3}', temp)
-        episode = int(nums[-1]) if nums else 0
+        if episode is None:
+            nums = self.num_re.findall(temp)
+            episode = int(nums[-1]) if nums else 0
 
-    return {
-        'filename': filename,
-        'format': file_format,
-        'file_id': file_id,
-        'season': season,
-        'episode': episode,
-        'quality': quality,
-        'quality_order': QUALITY_ORDER.get(quality, 7),
-        'is_series': bool(season or episode)
-    }
+        return season or 0, episode, quality
+
+    def cache_info(self):
+        return self.parse.cache_info()
+
+    def cache_clear(self):
+        self.parse.cache_clear()
+
+
+file_parser = FileInfoParser()
+
+
+class FileEntry:
+    """
+    One queued file with its parsed sort fields.
+
+    Slotted rather than a dict so large sessions stay small in memory;
+    format and quality strings are interned and shared by every entry.
+    """
+
+    __slots__ = ('filename', 'format', 'file_id', 'message_id', 'file_unique_id',
+                 'season', 'episode', 'quality', 'quality_order')
+
+    def __init__(self, filename, file_format, file_id=None, message_id=None,
+                 season=0, episode=0, quality='unknown', file_unique_id=None):
+        self.filename = filename
+        self.format = intern(file_format)
+        self.file_id = file_id
+        self.message_id = message_id
+        self.file_unique_id = file_unique_id
+        self.season = season
+        self.episode = episode
+        self.quality = intern(quality)
+        self.quality_order = QUALITY_ORDER.get(quality, 7)
+
+    @property
+    def is_series(self):
+        return bool(self.season or self.episode)
+
+    def to_doc(self):
+        """Minimal dict for storage; parsed fields are recomputed on load."""
+        doc = {'filename': self.filename, 'format': self.format}
+        if self.file_id:
+            doc['file_id'] = self.file_id
+        if self.message_id:
+            doc['message_id'] = self.message_id
+        if self.file_unique_id:
+            doc['file_unique_id'] = self.file_unique_id
+        return doc
+
+    def as_dict(self):
+        return {
+            'filename': self.filename,
+            'format': self.format,
+            'file_id': self.file_id,
+            'message_id': self.message_id,
+            'season': self.season,
+            'episode': self.episode,
+            'quality': self.quality,
+            'quality_order': self.quality_order,
+            'is_series': self.is_series
+        }
+
+    def __repr__(self):
+        return f"FileEntry({self.filename!r}, {self.format!r}, S{self.season} E{self.episode} {self.quality})"
+
+
+def extract_file_info(filename, file_format, file_id=None, message_id=None, file_unique_id=None):
+    season, episode, quality = file_parser.parse(filename)
+    return FileEntry(filename, file_format, file_id, message_id, season, episode, quality, file_unique_id)
+
+
+SORT_KEYS = {
+    'Quality': lambda x: (x.quality_order, x.filename.lower()),
+    'Season': lambda x: (x.season, x.filename.lower()),
+    'Episode': lambda x: (x.episode, x.filename.lower()),
+    'AllSQE': lambda x: (x.season, x.quality_order, x.episode),
+    'All': lambda x: (x.season, x.episode, x.quality_order),
+}
+NON_SERIES_KEY = lambda x: (x.filename.lower(), x.quality_order)
+
+# Same orderings as SORT_KEYS / NON_SERIES_KEY, most significant field first,
+# for the NumPy lexsort path ('name' is the rank of filename.lower()).
+SORT_FIELDS = {
+    'Quality': ('quality_order', 'name'),
+    'Season': ('season', 'name'),
+    'Episode': ('episode', 'name'),
+    'AllSQE': ('season', 'quality_order', 'episode'),
+    'All': ('season', 'episode', 'quality_order'),
+}
+NON_SERIES_FIELDS = ('name', 'quality_order')
+
+
+def _lexsort_files(infos, fields):
+    """Order parsed file infos by `fields` with np.lexsort (stable, like sorted())."""
+    columns = []
+    for field in reversed(fields):  # lexsort treats the last key as primary
+        if field == 'name':
+            # Stable rank of the lowered names; equal names keep input order,
+            # which is what the stable lexsort would do with them anyway.
+            names = [x.filename.lower() for x in infos]
+            rank = np.empty(len(infos), dtype=np.int64)
+            rank[sorted(range(len(names)), key=names.__getitem__)] = np.arange(len(infos))
+            columns.append(rank)
+        else:
+            columns.append(np.fromiter(map(attrgetter(field), infos), dtype=np.int64, count=len(infos)))
+    return [infos[i] for i in np.lexsort(columns)]
+
+
+def sort_file_infos(infos, mode='All', series=True):
+    """Sort parsed file infos, switching to NumPy for batches above VECTOR_SORT_THRESHOLD."""
+    if series:
+        key, fields = SORT_KEYS.get(mode, SORT_KEYS['All']), SORT_FIELDS.get(mode, SORT_FIELDS['All'])
+    else:
+        key, fields = NON_SERIES_KEY, NON_SERIES_FIELDS
+
+    if np is not None and len(infos) >= VECTOR_SORT_THRESHOLD:
+        return _lexsort_files(infos, fields)
+    return sorted(infos, key=key)
 
 
 def parse_and_sort_files(file_data, mode='All'):
@@ -74,29 +232,81 @@ def parse_and_sort_files(file_data, mode='All'):
     series, non_series = [], []
 
     for item in file_data:
-        info = extract_file_info(item['filename'], item['format'], item.get('file_id'))
-        (series if info['is_series'] else non_series).append(info)
-
-    if mode == 'Quality':
-        series = sorted(series, key=lambda x: (x['quality_order'], x['filename'].lower()))
-    elif mode == 'Season':
-        series = sorted(series, key=lambda x: (x['season'], x['filename'].lower()))
-    elif mode == 'Episode':
-        series = sorted(series, key=lambda x: (x['episode'], x['filename'].lower()))
-    elif mode == 'AllSQE':
-        series = sorted(series, key=lambda x: (x['season'], x['quality_order'], x['episode']))
-    else:  # 'All' - default/classic
-        series = sorted(series, key=lambda x: (x['season'], x['episode'], x['quality_order']))
-
-    non_series = sorted(non_series, key=lambda x: (x['filename'].lower(), x['quality_order']))
+        info = extract_file_info(item['filename'], item['format'], item.get('file_id'), item.get('message_id'))
+        (series if info.is_series else non_series).append(info)
+
+    series = sort_file_infos(series, mode)
+    non_series = sort_file_infos(non_series, series=False)
 
     return series, non_series
 
 
+class SequenceIndex:
+    """
+    Per-session file index that parses each file once, on arrival.
+
+    Series files are kept sorted for the session's current mode with
+    bisect (ties land after equal keys, matching a stable sort), so
+    /esequence can send straight away. A mode change re-keys the
+    already-parsed entries on next access instead of re-parsing them.
+    """
+
+    def __init__(self, mode='All'):
+        self.mode = mode if mode in SORT_KEYS else 'All'
+        self.series = []        # arrival order, used for re-keying
+        self.sorted_series = []
+        self.non_series = []
+
+    def __len__(self):
+        return len(self.series) + len(self.non_series)
+
+    def add(self, entry):
+        if entry.is_series:
+            self.series.append(entry)
+            insort(self.sorted_series, entry, key=SORT_KEYS[self.mode])
+        else:
+            insort(self.non_series, entry, key=NON_SERIES_KEY)
+        return entry
+
+    def rekey(self, mode):
+        mode = mode if mode in SORT_KEYS else 'All'
+        if mode != self.mode:
+            self.mode = mode
+            self.sorted_series = sort_file_infos(self.series, mode)
+
+    def ordered(self, mode=None):
+        """Return (series, non_series) sorted for `mode` (defaults to the current one)."""
+        if mode is not None:
+            self.rekey(mode)
+        return self.sorted_series, self.non_series
+
+
+# ==================== SESSIONS ====================
+
+async def get_session(user_id):
+    """Return the user's active session, rehydrating it from Mongo after a restart."""
+    session = user_sessions.get(user_id)
+    if session is not None:
+        return session
+
+    doc = await session_store.load(user_id)
+    if not doc or user_id in user_sessions:
+        return user_sessions.get(user_id)
+
+    files = SequenceIndex(doc.get('mode') or 'All')
+    for entry in doc.get('files', []):
+        files.add(extract_file_info(
+            entry['filename'], entry['format'], entry.get('file_id'), entry.get('message_id'), entry.get('file_unique_id')
+        ))
+    session = user_sessions[user_id] = {'files': files}
+    logger.info(f"Restored sequence session for {user_id} with {len(files)} file(s)")
+    return session
+
+
 # ==================== EXCLUDED COMMANDS ====================
 
 EXCLUDED_COMMANDS = [
-    "ssequence", "esequence", "mode", "cancel",
+    "ssequence", "esequence", "mode", "delivery", "cancel",
     "add_dump", "rem_dump", "dump_info", "leaderboard"
 ]
 
@@ -113,8 +323,9 @@ EXCLUDED_COMMANDS = [
 async def collect_files(client: Client, message: Message):
     try:
         user_id = message.from_user.id
+        session = await get_session(user_id)
 
-        if user_id not in user_sessions:
+        if session is None:
             if message.document or message.video or message.audio:
                 await handle_floodwait(
                     message.reply_text,
@@ -122,57 +333,45 @@ async def collect_files(client: Client, message: Message):
                 )
             return
 
-        session = user_sessions[user_id]
         files = session['files']
-        added_this_time = 0
+        entries = []
 
         # Text as filenames
         if message.text and not message.text.startswith("/"):
             for line in filter(None, map(str.strip, message.text.splitlines())):
-                files.append({'filename': line, 'format': 'text'})
-                added_this_time += 1
+                entries.append(extract_file_info(line, 'text'))
 
         if message.document:
-            files.append({
-                'filename': message.document.file_name,
-                'format': 'document',
-                'file_id': message.document.file_id
-            })
-            added_this_time += 1
+            entries.append(extract_file_info(
+                message.document.file_name, 'document', message.document.file_id, message.id,
+                message.document.file_unique_id
+            ))
 
         if message.video:
             filename = message.video.file_name or \
                        (message.caption if message.caption else f"video_{message.video.file_unique_id}.mp4")
-            files.append({
-                'filename': filename,
-                'format': 'video',
-                'file_id': message.video.file_id
-            })
-            added_this_time += 1
+            entries.append(extract_file_info(
+                filename, 'video', message.video.file_id, message.id, message.video.file_unique_id
+            ))
 
         if message.audio:
             filename = message.audio.file_name or f"audio_{message.audio.file_unique_id}"
-            files.append({
-                'filename': filename,
-                'format': 'audio',
-                'file_id': message.audio.file_id
-            })
-            added_this_time += 1
+            entries.append(extract_file_info(
+                filename, 'audio', message.audio.file_id, message.id, message.audio.file_unique_id
+            ))
 
+        added_this_time = len(entries)
         if added_this_time == 0:
             return
 
-        current_total = len(files)
+        for entry in entries:
+            files.add(entry)
+        session_store.append(user_id, entries)
 
-        # Debounce notification
-        if user_id in pending_notifications:
-            old_task = pending_notifications[user_id].get('timer')
-            if old_task and not old_task.done():
-                old_task.cancel()
+        current_total = len(files)
 
+        # Debounce notification: re-arming the shared timer just moves its deadline
         async def send_debounced_notification():
-            await asyncio.sleep(2.3)
-
             if user_id in user_sessions and len(user_sessions[user_id]['files']) == current_total:
                 # Always read from database
                 mode_key = await Seishiro.get_sequence_mode(user_id) or "All"
@@ -191,10 +390,13 @@ async def collect_files(client: Client, message: Message):
                     parse_mode=ParseMode.HTML
                 )
 
-            pending_notifications.pop(user_id, None)
+            # Only drop the entry if no newer file re-armed a fresh timer meanwhile
+            pending = pending_notifications.get(user_id)
+            if pending and pending['timer'].done():
+                pending_notifications.pop(user_id, None)
 
         pending_notifications[user_id] = {
-            'timer': asyncio.create_task(send_debounced_notification()),
+            'timer': timer_wheel.debounce(('notify', user_id), 2.3, send_debounced_notification),
             'last_count': current_total
         }
 
@@ -212,11 +414,12 @@ async def arrange_cmd(client: Client, message: Message):
     try:
         user_id = message.from_user.id
         
-        # Initialize session - files only (mode from DB)
-        user_sessions[user_id] = {'files': []}
-
         # Show current mode on start
         mode_key = await Seishiro.get_sequence_mode(user_id) or "All"
+
+        # Initialize session - files are parsed and indexed as they arrive
+        user_sessions[user_id] = {'files': SequenceIndex(mode_key)}
+        session_store.start(user_id, mode_key)
         mode_name = MODES.get(mode_key, MODES["All"])["button"]
 
         await handle_floodwait(
@@ -267,6 +470,146 @@ async def mode_cmd(client: Client, message: Message):
         await handle_floodwait(message.reply_text, "❌ Aɴ ᴇʀʀᴏʀ ᴏᴄᴄᴜʀʀᴇᴅ. Pʟᴇᴀsᴇ ᴛʀʏ ᴀɢᴀɪɴ.")
 
 
+# ==================== DELIVERY COMMAND ====================
+
+@Client.on_message(filters.command("delivery") & filters.private)
+@check_ban
+@check_fsub
+async def delivery_cmd(client: Client, message: Message):
+    try:
+        user_id = message.from_user.id
+        current = await Seishiro.get_delivery_mode(user_id)
+        current_name = DELIVERY_MODES.get(current, DELIVERY_MODES["single"])["button"]
+
+        lines = "\n".join(f"• <b>{info['button']}</b>: {info['desc']}" for info in DELIVERY_MODES.values())
+        await handle_floodwait(
+            message.reply_text,
+            f"<b><u>Sᴇʟᴇᴄᴛ Dᴇʟɪᴠᴇʀʏ Mᴏᴅᴇ</u></b> (Current: {current_name})\n\n"
+            f"<b>Available modes:</b>\n{lines}\n\n"
+            "<i>Choose how /esequence sends your files ↓</i>",
+            reply_markup=get_delivery_keyboard(current),
+            parse_mode=ParseMode.HTML
+        )
+    except Exception as e:
+        logger.error(f"Error in delivery command: {e}")
+        await handle_floodwait(message.reply_text, "❌ Aɴ ᴇʀʀᴏʀ ᴏᴄᴄᴜʀʀᴇᴅ. Pʟᴇᴀsᴇ ᴛʀʏ ᴀɢᴀɪɴ.")
+
+
+# ==================== SENDING ====================
+
+ALBUM_SIZE = 10  # Telegram's send_media_group limit
+COPY_BATCH_SIZE = 100  # Telegram's forward_messages limit
+
+INPUT_MEDIA = {
+    'document': InputMediaDocument,
+    'video': InputMediaVideo,
+    'audio': InputMediaAudio,
+}
+
+
+async def send_file(client: Client, chat_id, file_info, owner=None):
+    """
+    Send one sequenced item through the send scheduler on behalf of `owner`.
+    Returns the sent message, or None if it failed.
+    """
+    file_id = file_info.file_id
+    filename = file_info.filename or 'Unknown'
+    file_format = file_info.format
+    run = partial(handle_floodwait, send_scheduler.run, owner, chat_id)
+
+    if file_id and file_format == 'document':
+        return await run(client.send_document, chat_id=chat_id, document=file_id, caption=filename)
+    if file_id and file_format == 'video':
+        return await run(client.send_video, chat_id=chat_id, video=file_id, caption=filename)
+    if file_id and file_format == 'audio':
+        return await run(client.send_audio, chat_id=chat_id, audio=file_id, caption=filename)
+    return await run(client.send_message, chat_id=chat_id, text=f"📄 {filename}")
+
+
+def batch_runs(files, size, run_key):
+    """
+    Split the sorted files into runs of up to `size` consecutive items that
+    share the same run_key(). Items whose key is None come out as
+    single-item batches, so the overall order is unchanged.
+    """
+    batch, current = [], None
+    for file_info in files:
+        key = run_key(file_info)
+        if batch and (key is None or key != current or len(batch) == size):
+            yield batch
+            batch = []
+        if key is None:
+            yield [file_info]
+        else:
+            batch.append(file_info)
+            current = key
+    if batch:
+        yield batch
+
+
+def album_batches(files, size=ALBUM_SIZE):
+    """Runs of the same media type; text entries are never grouped."""
+    return batch_runs(
+        files, size,
+        lambda f: f.format if f.file_id and f.format in INPUT_MEDIA else None
+    )
+
+
+def copy_batches(files, size=COPY_BATCH_SIZE):
+    """Runs of files that still have their source message to forward."""
+    return batch_runs(files, size, lambda f: 'copy' if f.message_id else None)
+
+
+async def send_album(client: Client, chat_id, batch, owner=None):
+    """Send a batch as one media group with per-item captions. Returns the sent messages or None."""
+    media = [INPUT_MEDIA[f.format](f.file_id, caption=f.filename) for f in batch]
+    return await handle_floodwait(
+        send_scheduler.run, owner, chat_id,
+        client.send_media_group, chat_id=chat_id, media=media, cost=len(batch)
+    )
+
+
+async def copy_batch(client: Client, chat_id, batch, from_chat_id, owner=None):
+    """
+    Re-post a batch of source messages with one forward_messages call.
+    drop_author makes them look like copies; the bulk API can't set a new
+    caption, so the files keep the caption they were uploaded with.
+    """
+    return await handle_floodwait(
+        send_scheduler.run, owner, chat_id,
+        client.forward_messages,
+        chat_id=chat_id,
+        from_chat_id=from_chat_id,
+        message_ids=[f.message_id for f in batch],
+        drop_author=True,
+        cost=len(batch)
+    )
+
+
+def unsent_files(batch, sent):
+    """
+    The files in `batch` that have no counterpart among the `sent` messages.
+    A bulk send skips deleted or missing sources wherever they sit in the
+    batch, so the result is matched back by media file_unique_id (file_id
+    for entries stored before it was recorded) rather than by position.
+    """
+    delivered = Counter()
+    for sent_message in sent:
+        media = sent_message.document or sent_message.video or sent_message.audio
+        if media:
+            delivered[media.file_unique_id] += 1
+            delivered[media.file_id] += 1
+
+    missing = []
+    for file_info in batch:
+        key = file_info.file_unique_id or file_info.file_id
+        if key and delivered[key] > 0:
+            delivered[key] -= 1
+        else:
+            missing.append(file_info)
+    return missing
+
+
 # ==================== END SEQUENCE / SEND FILES ====================
 
 @Client.on_message(filters.command("esequence") & filters.private)
@@ -275,7 +618,7 @@ async def mode_cmd(client: Client, message: Message):
 async def end_cmd(client: Client, message: Message):
     try:
         user_id = message.from_user.id
-        session = user_sessions.get(user_id)
+        session = await get_session(user_id)
 
         if not session or not session.get('files'):
             await handle_floodwait(message.reply_text, "Nᴏ ғɪʟᴇs ᴡᴇʀᴇ sᴇɴᴛ ғᴏʀ sᴇǫᴜᴇɴᴄᴇ")
@@ -293,24 +636,26 @@ async def end_cmd(client: Client, message: Message):
 
         dump_channel = await Seishiro.get_dump_channel(user_id)
 
-        series, non_series = parse_and_sort_files(session['files'], mode_key)
+        with span("sort"):
+            series, non_series = session['files'].ordered(mode_key)
         total_files = len(series) + len(non_series)
         all_sorted_files = series + non_series
 
         is_dump_mode = bool(dump_channel)
 
+        # Status replies share the user's chat budget with the delivery
+        reply = partial(handle_floodwait, send_scheduler.run, user_id, message.chat.id, message.reply_text)
+
         if is_dump_mode:
             target_chat = dump_channel
-            await handle_floodwait(
-                message.reply_text,
+            await reply(
                 f"📤 Sᴇɴᴅɪɴɢ {total_files} ғɪʟᴇs ᴛᴏ ʏᴏᴜʀ ᴅᴜᴍᴘ ᴄʜᴀɴɴᴇʟ...\n"
                 f"Cʜᴀɴɴᴇʟ: <code>{dump_channel}</code>",
                 parse_mode=ParseMode.HTML
             )
         else:
             target_chat = message.chat.id
-            await handle_floodwait(
-                message.reply_text,
+            await reply(
                 f"📤 Sᴇɴᴅɪɴɢ {total_files} ғɪʟᴇs ɪɴ sᴇǫᴜᴇɴᴄᴇ ᴛᴏ ᴘʀɪᴠᴀᴛᴇ ᴄʜᴀᴛ...",
                 parse_mode=ParseMode.HTML
             )
@@ -318,47 +663,36 @@ async def end_cmd(client: Client, message: Message):
         sent_count = 0
         failed_files = []
 
-        for file_info in all_sorted_files:
-            try:
-                file_id = file_info.get('file_id')
-                filename = file_info.get('filename', 'Unknown')
-                file_format = file_info.get('format')
-
-                if file_id and file_format in ['document', 'video', 'audio']:
-                    if file_format == 'document':
-                        await handle_floodwait(
-                            client.send_document,
-                            chat_id=target_chat,
-                            document=file_id,
-                            caption=filename
-                        )
-                    elif file_format == 'video':
-                        await handle_floodwait(
-                            client.send_video,
-                            chat_id=target_chat,
-                            video=file_id,
-                            caption=filename
-                        )
-                    elif file_format == 'audio':
-                        await handle_floodwait(
-                            client.send_audio,
-                            chat_id=target_chat,
-                            audio=file_id,
-                            caption=filename
-                        )
-                else:
-                    await handle_floodwait(
-                        client.send_message,
-                        chat_id=target_chat,
-                        text=f"📄 {filename}"
-                    )
-
-                sent_count += 1
-
-            except Exception as file_error:
-                logger.error(f"Failed to send file {filename}: {file_error}")
-                failed_files.append(filename)
-                continue
+        delivery = await Seishiro.get_delivery_mode(user_id)
+        if delivery == "album":
+            batches = album_batches(all_sorted_files)
+            send_batch = send_album
+        elif delivery == "copy":
+            batches = copy_batches(all_sorted_files)
+            send_batch = partial(copy_batch, from_chat_id=message.chat.id)
+        else:
+            batches = ([file_info] for file_info in all_sorted_files)
+            send_batch = None
+
+        for batch in batches:
+            if len(batch) > 1:
+                sent = await send_batch(client, target_chat, batch, owner=user_id) or []
+                missing = unsent_files(batch, sent)
+                sent_count += len(batch) - len(missing)
+                if missing:
+                    logger.warning(f"Bulk {delivery} send missed {len(missing)} file(s), retrying them one by one")
+                batch = missing
+
+            for file_info in batch:
+                filename = file_info.filename or 'Unknown'
+                try:
+                    if await send_file(client, target_chat, file_info, owner=user_id):
+                        sent_count += 1
+                    else:
+                        failed_files.append(filename)
+                except Exception as file_error:
+                    logger.error(f"Failed to send file {filename}: {file_error}")
+                    failed_files.append(filename)
 
         completion_msg = f"✅ Sᴜᴄᴄᴇssғᴜʟʟʏ sᴇɴᴛ {sent_count}/{total_files} ғɪʟᴇs"
 
@@ -372,7 +706,7 @@ async def end_cmd(client: Client, message: Message):
             if len(failed_files) <= 5:
                 completion_msg += "\n" + "\n".join([f"• {f}" for f in failed_files])
 
-        await handle_floodwait(message.reply_text, completion_msg)
+        await reply(completion_msg)
 
         # Update user stats
         await Seishiro.col.update_one(
@@ -385,10 +719,12 @@ async def end_cmd(client: Client, message: Message):
                 }
             }
         )
+        leaderboard.record(user_id, sent_count, message.from_user.mention)
 
         # Cleanup session
         if user_id in user_sessions:
             del user_sessions[user_id]
+        session_store.end(user_id)
 
     except Exception as e:
         logger.error(f"Error in esequence command: {e}")
@@ -404,7 +740,7 @@ async def cancel_cmd(client: Client, message: Message):
     try:
         user_id = message.from_user.id
 
-        if user_id in user_sessions:
+        if await get_session(user_id):
             if user_id in pending_notifications:
                 task = pending_notifications[user_id].get('timer')
                 if task and not task.done():
@@ -418,6 +754,7 @@ async def cancel_cmd(client: Client, message: Message):
                     pass
 
             del user_sessions[user_id]
+            session_store.end(user_id)
             await handle_floodwait(message.reply_text, "Sᴇǫᴜᴇɴᴄᴇ ᴄᴀɴᴄᴇʟʟᴇᴅ...!!")
         else:
             await handle_floodwait(message.reply_text, "Nᴏ ᴀᴄᴛɪᴠᴇ sᴇǫᴜᴇɴᴄᴇ ғᴏᴜɴᴅ.")
@@ -473,8 +810,8 @@ async def add_dump_cmd(client: Client, message: Message):
                 chat_id=channel_id,
                 text="✅ Dump channel connected successfully!"
             )
-            await asyncio.sleep(2)
-            await test_msg.delete()
+            # Clean up the test message later instead of holding the handler
+            timer_wheel.call_later(2, test_msg.delete)
 
         except Exception as e:
             await handle_floodwait(
@@ -569,11 +906,7 @@ async def leaderboard_cmd(client: Client, message: Message):
     try:
         user_id = message.from_user.id
 
-        cursor = Seishiro.col.find(
-            {"sequence_count": {"$exists": True, "$gt": 0}}
-        ).sort("sequence_count", -1).limit(10)
-
-        top_users = await cursor.to_list(length=10)
+        top_users = await leaderboard.top(10)
 
         if not top_users:
             await handle_floodwait(
@@ -591,11 +924,8 @@ async def leaderboard_cmd(client: Client, message: Message):
         current_user_rank = None
         current_user_count = 0
 
-        for idx, user in enumerate(top_users, 1):
-            count = user.get("sequence_count", 0)
-            mention = user.get("mention", f"User {user['_id']}")
-
-            if user["_id"] == user_id:
+        for idx, (top_id, count, mention) in enumerate(top_users, 1):
+            if top_id == user_id:
                 current_user_rank = idx
                 current_user_count = count
 
@@ -604,13 +934,9 @@ async def leaderboard_cmd(client: Client, message: Message):
             text += f"   └ <b>{count:,}</b> files sequenced\n\n"
 
         if current_user_rank is None:
-            user_doc = await Seishiro.col.find_one({"_id": user_id})
-            user_count = user_doc.get("sequence_count", 0) if user_doc else 0
+            rank, user_count = await leaderboard.rank(user_id)
 
             if user_count > 0:
-                rank = await Seishiro.col.count_documents({
-                    "sequence_count": {"$gt": user_count}
-                }) + 1
                 text += "─────────────────\n"
                 text += f"📍 <b>Your Rank:</b> #{rank}\n"
                 text += f"   └ <b>{user_count:,}</b> files sequenced"
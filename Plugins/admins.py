@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+from config import *
+from Database.database import Seishiro
+
+logger = logging.getLogger(__name__)
+
+
+class AdminSet:
+    """
+    In-memory copy of the bot admins.
+
+    Warmed from list_admins() at startup and updated by /add_admin and
+    /deladmin, so the admin filter is a set lookup. A refresh every
+    ADMIN_SYNC_INTERVAL seconds lets several running copies of the bot
+    converge on changes made by one of them.
+    """
+
+    def __init__(self, interval=ADMIN_SYNC_INTERVAL):
+        self.interval = interval
+        self.ids = None     # None until loaded; lookups fall back to Mongo
+        self.changes = 0
+        self.task = None
+
+    async def is_admin(self, user_id) -> bool:
+        if user_id == OWNER_ID:
+            return True
+        if self.ids is None:
+            return await Seishiro.is_admin(user_id)
+        return user_id in self.ids
+
+    async def add(self, user_id) -> bool:
+        self.changes += 1
+        if not await Seishiro.add_admin(user_id):
+            return False
+        if self.ids is not None:
+            self.ids.add(int(user_id))
+        return True
+
+    async def remove(self, user_id) -> bool:
+        self.changes += 1
+        removed = await Seishiro.remove_admin(user_id)
+        if self.ids is not None:
+            self.ids.discard(int(user_id))
+        return removed
+
+    async def load(self):
+        """Read the admin list and start the periodic refresh."""
+        await self.refresh()
+        logger.info(f"Loaded {len(self.ids or ())} admin(s)")
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._sync_loop())
+
+    async def refresh(self):
+        changes = self.changes
+        ids = set(await Seishiro.list_admins())
+        if changes != self.changes and self.ids is not None:
+            # An add/remove landed mid-read; keep the live set, try next round.
+            return
+        self.ids = ids
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing admin list: {e}")
+
+
+admin_set = AdminSet()
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import re
+from datetime import datetime
+
+from config import *
+from Database.database import Seishiro
+
+logger = logging.getLogger(__name__)
+
+DURATION_RE = re.compile(r'^(\d+)([smhdw])$', re.IGNORECASE)
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_duration(text):
+    """'30m' / '12h' / '7d' → seconds, or None if `text` is not a duration."""
+    match = DURATION_RE.match(text)
+    if not match:
+        return None
+    return int(match.group(1)) * DURATION_UNITS[match.group(2).lower()]
+
+
+class BanList:
+    """
+    In-memory copy of the banned users.
+
+    Loaded once at startup and kept current by /ban and /unban, so checking
+    a message costs a dict lookup instead of a find_one. Timed bans carry
+    their expiry and lapse on their own; a background reconcile every
+    BAN_SYNC_INTERVAL seconds picks up edits made outside the bot and marks
+    lapsed bans as lifted in Mongo.
+    """
+
+    def __init__(self, interval=BAN_SYNC_INTERVAL):
+        self.interval = interval
+        self.banned = None      # user_id → expiry datetime, or None for permanent (None = not loaded)
+        self.changes = 0        # bumped by ban()/unban() so reconcile() can spot a race
+        self.task = None
+
+    async def is_banned(self, user_id) -> bool:
+        if self.banned is None:
+            return await Seishiro.is_user_banned(user_id)
+        if user_id not in self.banned:
+            return False
+        expires = self.banned[user_id]
+        if expires is not None and expires <= datetime.now():
+            del self.banned[user_id]
+            return False
+        return True
+
+    async def ban(self, user_id, reason, duration=0) -> bool:
+        self.changes += 1
+        if not await Seishiro.ban_user(user_id, reason, duration):
+            return False
+        if self.banned is not None:
+            self.banned[user_id] = Seishiro.ban_expiry({
+                "ban_duration": duration,
+                "banned_on": datetime.now().isoformat(timespec="seconds"),
+            })
+        return True
+
+    async def unban(self, user_id) -> bool:
+        self.changes += 1
+        if not await Seishiro.unban_user(user_id):
+            return False
+        if self.banned is not None:
+            self.banned.pop(user_id, None)
+        return True
+
+    async def load(self):
+        """Read the ban list and start the periodic reconcile."""
+        await self.reconcile()
+        logger.info(f"Loaded {len(self.banned or ())} banned user(s)")
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._sync_loop())
+
+    async def reconcile(self):
+        changes = self.changes
+        docs = await Seishiro.get_banned_users()
+        if docs is None:
+            return
+        if changes != self.changes and self.banned is not None:
+            # A /ban or /unban landed mid-read; keep the live list, try next round.
+            return
+        now = datetime.now()
+        banned, lapsed = {}, []
+        for doc in docs:
+            expires = Seishiro.ban_expiry(doc.get("ban_status", {}))
+            if expires is not None and expires <= now:
+                lapsed.append(doc["_id"])
+            else:
+                banned[doc["_id"]] = expires
+        self.banned = banned
+        if lapsed:
+            lifted = await Seishiro.lift_bans(lapsed)
+            logger.info(f"Lifted {lifted} expired ban(s)")
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Error reconciling ban list: {e}")
+
+
+ban_list = BanList()
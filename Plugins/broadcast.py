@@ -0,0 +1,311 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import timedelta
+from uuid import uuid4
+
+from pyrogram.enums import ParseMode
+from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid, RPCError
+
+from config import *
+from Database.database import Seishiro
+from Plugins.leaderboard import leaderboard
+from Plugins.metrics import FLOODWAIT_SLEPT
+from Plugins.scheduler import send_scheduler
+
+logger = logging.getLogger(__name__)
+
+FLOODWAIT_RETRIES = 3
+DEAD_FLUSH_SIZE = 500
+CHECKPOINT_EVERY = 100   # handled users between checkpoint saves
+
+
+async def send_msg(user_id, message):
+    """Copy `message` to one user. 200 = sent, 400 = user is gone, 500 = other failure."""
+    for attempt in range(FLOODWAIT_RETRIES + 1):
+        try:
+            await send_scheduler.run("broadcast", int(user_id), message.copy, chat_id=int(user_id))
+            return 200
+        except FloodWait as e:
+            if attempt == FLOODWAIT_RETRIES:
+                logger.error(f"{user_id} : Gave up after {attempt + 1} FloodWaits")
+                return 500
+            logger.warning(f"FloodWait for user {user_id}: waiting {e.value}s")
+            FLOODWAIT_SLEPT.inc("broadcast", amount=e.value)
+            await asyncio.sleep(e.value)
+        except InputUserDeactivated:
+            logger.info(f"{user_id} : Deactivated")
+            return 400
+        except UserIsBlocked:
+            logger.info(f"{user_id} : Blocked The Bot")
+            return 400
+        except PeerIdInvalid:
+            logger.info(f"{user_id} : User ID Invalid")
+            return 400
+        except RPCError as e:
+            logger.error(f"{user_id} : RPC Error - {e}")
+            return 500
+        except Exception as e:
+            logger.error(f"{user_id} : Unexpected error - {e}")
+            return 500
+
+
+class Broadcast:
+    """
+    One broadcast job, persisted in Mongo so it survives restarts.
+
+    User ids are streamed from an `_id`-only cursor into a small queue and
+    sent by a pool of `workers` tasks. Pacing is left to the shared send
+    scheduler, so a broadcast runs as fast as the global budget allows
+    without starving /esequence deliveries. Users who blocked the bot or
+    deleted their account are removed with one bulk_write per
+    DEAD_FLUSH_SIZE.
+
+    The checkpoint is the highest `_id` below which every user has been
+    handled (senders finish out of order). It is saved with the counters
+    every CHECKPOINT_EVERY handled users, independently of the status
+    edit every `progress_interval` seconds. Resuming starts the cursor
+    after it, so a crash sends at most CHECKPOINT_EVERY handled users plus
+    the ones queued or in flight (up to 5 × `workers`) a second time.
+    """
+
+    def __init__(self, client, job_id, from_chat_id, message_id, status_chat, status_message,
+                 total=0, workers=BROADCAST_WORKERS, batch_size=BROADCAST_BATCH_SIZE,
+                 progress_interval=BROADCAST_PROGRESS_INTERVAL):
+        self.client = client
+        self.job_id = job_id
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        self.status_chat = status_chat
+        self.status_message = status_message
+        self.total = total
+        self.workers = workers
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+
+        self.status = "running"   # running / paused / cancelled / done / failed
+        self.last_id = None       # checkpoint
+        self.done = 0
+        self.success = 0
+        self.failed = 0
+        self.removed = 0
+        self.dead = []
+        self.unsaved = 0          # handled since the last checkpoint save
+        self.message = None
+        self.task = None
+
+        self.started = None       # this run only, for throughput
+        self.done_at_start = 0
+
+    @classmethod
+    def from_doc(cls, client, doc):
+        job = cls(client, doc["_id"], doc["from_chat_id"], doc["message_id"],
+                  doc["status_chat"], doc["status_message"], doc.get("total", 0))
+        job.status = doc["status"]
+        job.last_id = doc.get("last_id")
+        job.done = doc.get("done", 0)
+        job.success = doc.get("success", 0)
+        job.failed = doc.get("failed", 0)
+        job.removed = doc.get("removed", 0)
+        return job
+
+    def to_doc(self) -> dict:
+        return {
+            "from_chat_id": self.from_chat_id,
+            "message_id": self.message_id,
+            "status_chat": self.status_chat,
+            "status_message": self.status_message,
+            "status": self.status,
+            "last_id": self.last_id,
+            "total": self.total,
+            "done": self.done,
+            "success": self.success,
+            "failed": self.failed,
+            "removed": self.removed,
+        }
+
+    # ==================== PROGRESS ====================
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started if self.started else 0.0
+
+    @property
+    def speed(self) -> float:
+        """Users per second in the current run."""
+        elapsed = self.elapsed
+        return (self.done - self.done_at_start) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left at the current speed, or None if unknown."""
+        if self.status != "running" or not self.speed:
+            return None
+        return max(0, self.total - self.done) / self.speed
+
+    def progress_text(self) -> str:
+        eta = self.eta
+        return (
+            f"Broadcast {self.status.title()}: <code>{self.job_id}</code>\n\n"
+            f"Total Users {self.total} \n"
+            f"Completed : {self.done} / {self.total}\n"
+            f"Success : {self.success}\n"
+            f"Failed : {self.failed}\n"
+            f"Removed : {self.removed}\n"
+            f"Speed : {self.speed:.1f}/s\n"
+            f"ETA : {timedelta(seconds=int(eta)) if eta is not None else '-'}"
+        )
+
+    async def save(self):
+        await Seishiro.save_broadcast(self.job_id, self.to_doc())
+
+    async def show_progress(self):
+        await send_scheduler.run(
+            "broadcast", self.status_chat,
+            self.client.edit_message_text, self.status_chat, self.status_message, self.progress_text(),
+            parse_mode=ParseMode.HTML
+        )
+
+    # ==================== CONTROL ====================
+
+    def start(self):
+        self.status = "running"
+        self.task = asyncio.create_task(self._run_guarded())
+        return self.task
+
+    def pause(self):
+        if self.status == "running":
+            self.status = "paused"
+
+    def cancel(self):
+        if self.status in ("running", "paused"):
+            self.status = "cancelled"
+            if self.task is None or self.task.done():
+                asyncio.create_task(self._finish())
+
+    @property
+    def active(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    # ==================== RUN ====================
+
+    async def _run_guarded(self):
+        try:
+            await self.run()
+        except Exception as e:
+            logger.error(f"Broadcast {self.job_id} failed: {e}")
+            self.status = "failed"
+            await self._finish()
+
+    async def run(self):
+        if self.message is None:
+            self.message = await self.client.get_messages(self.from_chat_id, self.message_id)
+        await self.save()
+
+        self.started = time.monotonic()
+        self.done_at_start = self.done
+        queue = asyncio.Queue(maxsize=self.workers * 4)
+        dispatched = deque()     # ids in cursor order, not yet folded into the checkpoint
+        handled = set()
+        senders = [asyncio.create_task(self._sender(queue, dispatched, handled)) for _ in range(self.workers)]
+        reporter = asyncio.create_task(self._report())
+
+        try:
+            async for user in Seishiro.iter_user_ids(self.batch_size, after=self.last_id):
+                if self.status != "running":
+                    break
+                dispatched.append(user['_id'])
+                await queue.put(user['_id'])
+            for _ in senders:
+                await queue.put(None)
+            await asyncio.gather(*senders)
+        finally:
+            for task in senders:
+                task.cancel()
+            reporter.cancel()
+            await self._flush_dead()
+
+        if self.status == "running":
+            self.status = "done"
+        await self._finish()
+
+    async def _sender(self, queue, dispatched, handled):
+        while True:
+            user_id = await queue.get()
+            if user_id is None:
+                return
+            if self.status != "running":
+                continue  # paused/cancelled: leave it for the next run
+            sts = await send_msg(user_id, self.message)
+            if sts == 200:
+                self.success += 1
+            else:
+                self.failed += 1
+            if sts == 400:
+                self.dead.append(user_id)
+                if len(self.dead) >= DEAD_FLUSH_SIZE:
+                    await self._flush_dead()
+            self.done += 1
+
+            handled.add(user_id)
+            while dispatched and dispatched[0] in handled:
+                self.last_id = dispatched.popleft()
+                handled.discard(self.last_id)
+
+            self.unsaved += 1
+            if self.unsaved >= CHECKPOINT_EVERY:
+                self.unsaved = 0
+                await self.save()
+
+    async def _flush_dead(self):
+        if not self.dead:
+            return
+        dead, self.dead = self.dead, []
+        self.removed += await Seishiro.delete_users(dead)
+        leaderboard.forget(dead)
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            try:
+                await self.show_progress()
+            except FloodWait as e:
+                logger.warning(f"FloodWait during status update: waiting {e.value}s")
+                await asyncio.sleep(e.value)
+            except Exception as e:
+                logger.error(f"Error updating broadcast status: {e}")
+
+    async def _finish(self):
+        await self.save()
+        if self.status in ("done", "cancelled", "failed"):
+            jobs.pop(self.job_id, None)
+        try:
+            await self.show_progress()
+        except Exception as e:
+            logger.error(f"Error sending final broadcast status: {e}")
+
+
+# ==================== JOB REGISTRY ====================
+
+jobs = {}   # job_id → Broadcast, for jobs that are running or paused
+
+
+async def start_broadcast(client, message, status_message, total):
+    """Create a job for copying `message` to every user and start it."""
+    job = Broadcast(client, uuid4().hex[:8], message.chat.id, message.id,
+                    status_message.chat.id, status_message.id, total)
+    job.message = message
+    jobs[job.job_id] = job
+    job.start()
+    return job
+
+
+async def resume_broadcasts(client):
+    """Pick up jobs left behind by a restart: running ones continue, paused ones wait."""
+    for doc in await Seishiro.get_unfinished_broadcasts():
+        job = Broadcast.from_doc(client, doc)
+        jobs[job.job_id] = job
+        if job.status == "running":
+            job.start()
+            logger.info(f"Resumed broadcast {job.job_id} after user {job.last_id}")
@@ -1,10 +1,11 @@
 from pyrogram import Client
 from pyrogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, InputMediaPhoto
 from pyrogram.enums import ParseMode
-from pyrogram.errors import FloodWait
+from pyrogram.errors import FloodWait, MessageNotModified
 import asyncio
 
 from Database.database import Seishiro
+from Plugins.membership import membership
 # If you need user_sessions: uncomment and adjust path
 # from Plugins.sequence import user_sessions
 
@@ -42,6 +43,25 @@ MODES = {
 
 MODE_ORDER = ["Quality", "All", "AllSQE", "Episode", "Season"]
 
+# How /esequence delivers the sorted files
+DELIVERY_MODES = {
+    "single": {
+        "button": "Oɴᴇ ʙʏ ᴏɴᴇ",
+        "desc": "Send every file on its own (default)",
+        "answer": "Delivery mode set to one by one"
+    },
+    "album": {
+        "button": "Aʟʙᴜᴍs",
+        "desc": "Group consecutive files of the same type into albums of up to 10",
+        "answer": "Delivery mode set to albums"
+    },
+    "copy": {
+        "button": "Bᴜʟᴋ ᴄᴏᴘʏ",
+        "desc": "Re-post your original messages 100 at a time (fastest, keeps original captions)",
+        "answer": "Delivery mode set to bulk copy"
+    }
+}
+
 
 def get_mode_keyboard(current_mode: str) -> InlineKeyboardMarkup:
     """Generate fresh mode selection keyboard with current selection marked"""
@@ -64,6 +84,18 @@ def get_mode_keyboard(current_mode: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+def get_delivery_keyboard(current_mode: str) -> InlineKeyboardMarkup:
+    """Delivery mode keyboard with the current selection marked"""
+    row = [
+        InlineKeyboardButton(
+            info["button"] + (" ✅" if key == current_mode else ""),
+            callback_data=f"delivery_{key}"
+        )
+        for key, info in DELIVERY_MODES.items()
+    ]
+    return InlineKeyboardMarkup([row[i:i + 2] for i in range(0, len(row), 2)])
+
+
 @Client.on_callback_query()
 async def settings_callback(client: Client, callback_query: CallbackQuery):
     user_id = callback_query.from_user.id
@@ -122,6 +154,25 @@ async def settings_callback(client: Client, callback_query: CallbackQuery):
                     disable_web_page_preview=True
                 )
 
+        # ─── Delivery Mode Callbacks ──────────────────────────────
+        elif data.startswith("delivery_"):
+            delivery_key = data.split("_", 1)[1]
+
+            if delivery_key not in DELIVERY_MODES:
+                await callback_query.answer("Unknown delivery mode!", show_alert=True)
+                return
+
+            await Seishiro.set_delivery_mode(user_id, delivery_key)
+            await callback_query.answer(DELIVERY_MODES[delivery_key]["answer"])
+
+            try:
+                await callback_query.message.edit_reply_markup(get_delivery_keyboard(delivery_key))
+            except FloodWait as e:
+                await asyncio.sleep(e.value + 1)
+                await callback_query.message.edit_reply_markup(get_delivery_keyboard(delivery_key))
+            except MessageNotModified:
+                pass
+
         # ─── Other existing callbacks ──────────────────────────────
         elif data == "about":
             user = await client.get_users(OWNER_ID)  # Make sure OWNER_ID is defined somewhere
@@ -217,6 +268,8 @@ async def settings_callback(client: Client, callback_query: CallbackQuery):
             mode = "on" if action == "on" else "off"
 
             await Seishiro.set_channel_mode(cid, mode)
+            # Pending join requests count only in request mode
+            membership.clear()
             await callback_query.answer(f"Force-Sub set to {'ON' if mode == 'on' else 'OFF'}")
 
             chat = await client.get_chat(cid)
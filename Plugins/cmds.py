@@ -2,11 +2,19 @@ from config import *
 from Plugins.callbacks import *
 from Plugins.start import *
 from Database.database import Seishiro
+from Plugins.admins import admin_set
+from Plugins.bans import ban_list, parse_duration
+from Plugins.broadcast import jobs, start_broadcast
+from Plugins.invites import invite_pool
+from Plugins.membership import membership, SUBSCRIBED
+from Plugins.scheduler import send_scheduler
+from Plugins.timers import timer_wheel
+from Plugins.tracing import tracer
 from pyrogram.types import Message, ChatMemberUpdated, ChatJoinRequest, InlineKeyboardButton, InlineKeyboardMarkup
 from pyrogram import Client, filters
-from pyrogram.errors import PeerIdInvalid, FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid
+from pyrogram.errors import PeerIdInvalid
 from pyrogram.enums import ChatType, ChatMemberStatus
-from datetime import date
+from datetime import date, datetime
 import time
 import logging
 
@@ -15,10 +23,7 @@ logger.setLevel(logging.INFO)
 
 async def check_admin(filter, client, message):
     try:
-        user_id = message.from_user.id
-        if user_id == OWNER_ID:
-            return True
-        return await Seishiro.is_admin(user_id)
+        return await admin_set.is_admin(message.from_user.id)
     except Exception as e:
         logger.error(f"Exception in check_admin: {e}")
         return False
@@ -63,7 +68,9 @@ async def add_admins(client: Client, message: Message):
 
             try:
                 user = await client.get_users(user_id)
-                await Seishiro.add_admin(user_id)
+                if not await admin_set.add(user_id):
+                    admin_list += f"<blockquote><b>❌ Fᴀɪʟᴇᴅ ᴛᴏ ᴀᴅᴅ {user.mention} (<code>{user_id}</code>), ᴛʀʏ ᴀɢᴀɪɴ.</b></blockquote>\n"
+                    continue
                 successfully_added.append(user_id)
                 admin_list += f"<b>• Nᴀᴍᴇ: {user.mention}\n⚡ Iᴅ: <code>{user_id}</code></b>\n\n"
             except Exception as e:
@@ -107,7 +114,7 @@ async def delete_admins(client: Client, message: Message):
                         removed_list += f"<b>• Nᴀᴍᴇ: {user.mention}\n⚡ Iᴅ: <code>{id}</code></b>\n\n"
                     except:
                         removed_list += f"<b>• Iᴅ: <code>{id}</code></b>\n\n"
-                    await Seishiro.remove_admin(id)
+                    await admin_set.remove(id)
                 return await pro.edit(
                     f"<b><u>✅ Rᴇᴍᴏᴠᴇᴅ ᴀʟʟ ᴀᴅᴍɪɴs:</u></b>\n\n{removed_list}",
                     reply_markup=reply_markup
@@ -133,7 +140,7 @@ async def delete_admins(client: Client, message: Message):
                         passed += f"<b>• Nᴀᴍᴇ: {user.mention}\n⚡ Iᴅ: <code>{id}</code></b>\n\n"
                     except:
                         passed += f"<b>• Iᴅ: <code>{id}</code></b>\n\n"
-                    await Seishiro.remove_admin(id)
+                    await admin_set.remove(id)
                 else:
                     passed += f"<blockquote><b>⚠️ ID <code>{id}</code> ɴᴏᴛ ғᴏᴜɴᴅ ɪɴ ᴀᴅᴍɪɴ ʟɪsᴛ.</b></blockquote>\n"
 
@@ -183,16 +190,24 @@ async def ban_user(bot, message):
         command_parts = message.text.split(maxsplit=2)
         if len(command_parts) < 2:
             await message.reply_text(
-                "<b>Usᴇ ɪᴛ ʟɪᴋᴇ ᴛʜɪs:</b> <code>/ban &lt;ᴜsᴇʀ_ɪᴅ&gt; [ʀᴇᴀsᴏɴ]</code>"
+                "<b>Usᴇ ɪᴛ ʟɪᴋᴇ ᴛʜɪs:</b> <code>/ban &lt;ᴜsᴇʀ_ɪᴅ&gt; [ᴅᴜʀᴀᴛɪᴏɴ] [ʀᴇᴀsᴏɴ]</code>\n"
+                "<i>ᴅᴜʀᴀᴛɪᴏɴ: 30m, 12h, 7d... (ᴏᴍɪᴛ ғᴏʀ ᴘᴇʀᴍᴀɴᴇɴᴛ)</i>"
             )
             return
 
         user_id_str = command_parts[1]
-        reason = command_parts[2] if len(command_parts) > 2 else "Nᴏ ʀᴇᴀsᴏɴ ᴘʀᴏᴠɪᴅᴇᴅ"
+        reason = command_parts[2] if len(command_parts) > 2 else ""
+
+        # Optional timed ban: /ban <user_id> 7d [reason]
+        length, _, rest = reason.partition(" ")
+        duration = parse_duration(length)
+        if duration is not None:
+            reason = rest.strip()
+        reason = reason or "Nᴏ ʀᴇᴀsᴏɴ ᴘʀᴏᴠɪᴅᴇᴅ"
 
         if not user_id_str.isdigit():
             await message.reply_text(
-                "<b>Usᴇ ɪᴛ ʟɪᴋᴇ ᴛʜɪs:</b> <code>/ban &lt;ᴜsᴇʀ_ɪᴅ&gt; [ʀᴇᴀsᴏɴ]</code>"
+                "<b>Usᴇ ɪᴛ ʟɪᴋᴇ ᴛʜɪs:</b> <code>/ban &lt;ᴜsᴇʀ_ɪᴅ&gt; [ᴅᴜʀᴀᴛɪᴏɴ] [ʀᴇᴀsᴏɴ]</code>"
             )
             return
             
@@ -204,21 +219,18 @@ async def ban_user(bot, message):
         except:
             user_mention = f"<code>{user_id}</code>"
             
-        await Seishiro.ban_data.update_one(
-            {"_id": user_id},
-            {"$set": {
-                "ban_status.is_banned": True,
-                "ban_status.ban_reason": reason,
-                "ban_status.banned_on": date.today().isoformat()
-            }},
-            upsert=True
-        )
-        
+        if not await ban_list.ban(user_id, reason, duration or 0):
+            await message.reply_text("<b>❌ Fᴀɪʟᴇᴅ ᴛᴏ ʙᴀɴ ᴜsᴇʀ, ᴛʀʏ ᴀɢᴀɪɴ.</b>")
+            return
+
+        if duration is None:
+            length = "Pᴇʀᴍᴀɴᴇɴᴛ"
         await message.reply_text(
             f"<b>🚫 Usᴇʀ ʙᴀɴɴᴇᴅ sᴜᴄᴄᴇssғᴜʟʟʏ</b>\n\n"
             f"<b>• Usᴇʀ: {user_mention}\n"
             f"⚡ Usᴇʀ ID: <code>{user_id}</code>\n"
             f"📝 Rᴇᴀsᴏɴ: {reason}\n"
+            f"⏳ Dᴜʀᴀᴛɪᴏɴ: {length}\n"
             f"📅 Bᴀɴɴᴇᴅ ᴏɴ: {date.today().strftime('%d-%m-%Y')}</b>"
         )
         
@@ -255,14 +267,9 @@ async def unban_user(bot, message):
         except:
             user_mention = f"<code>{user_id}</code>"
             
-        await Seishiro.ban_data.update_one(
-            {"_id": user_id},
-            {"$set": {
-                "ban_status.is_banned": False,
-                "ban_status.ban_reason": "",
-                "ban_status.banned_on": None
-            }}
-        )
+        if not await ban_list.unban(user_id):
+            await message.reply_text("<b>❌ Fᴀɪʟᴇᴅ ᴛᴏ ᴜɴʙᴀɴ ᴜsᴇʀ, ᴛʀʏ ᴀɢᴀɪɴ.</b>")
+            return
         
         await message.reply_text(
             f"<b>✅ Usᴇʀ ᴜɴʙᴀɴɴᴇᴅ sᴜᴄᴄᴇssғᴜʟʟʏ</b>\n\n"
@@ -367,18 +374,23 @@ async def change_force_sub_mode(client: Client, message: Message):
 @Client.on_chat_member_updated()
 async def handle_Chatmembers(client, chat_member_updated: ChatMemberUpdated):
     chat_id = chat_member_updated.chat.id
+    old_member = chat_member_updated.old_chat_member
+    new_member = chat_member_updated.new_chat_member
 
-    if await Seishiro.req_user_exist(chat_id, user_id):
-        old_member = chat_member_updated.old_chat_member
-
-        if not old_member:
-            return
+    member = new_member or old_member
+    if not member or not member.user:
+        return
+    user_id = member.user.id
 
-        if old_member.status == ChatMemberStatus.MEMBER:
-            user_id = old_member.user.id
+    # Keep the force-sub membership cache in step with the channel
+    if new_member and new_member.status in SUBSCRIBED:
+        membership.remember(chat_id, user_id, True)
+    else:
+        membership.forget(chat_id, user_id)
 
-            if await Seishiro.req_user_exist(chat_id, user_id):
-                await Seishiro.del_req_user(chat_id, user_id)
+    if old_member and old_member.status == ChatMemberStatus.MEMBER:
+        if await Seishiro.req_user_exist(chat_id, user_id):
+            await Seishiro.del_req_user(chat_id, user_id)
 
 
 # This handler will capture any join request to the channel/group where the bot is an admin
@@ -392,6 +404,8 @@ async def handle_join_request(client, chat_join_request):
     if chat_id in all_channels:
         if not await Seishiro.req_user_exist(chat_id, user_id):
             await Seishiro.req_user(chat_id, user_id)
+        if await Seishiro.get_channel_mode(chat_id) == "on":
+            membership.remember(chat_id, user_id, True, requested=True)
 
 @Client.on_message(filters.command('addchnl') & filters.private & admin)
 async def add_force_sub(client: Client, message: Message):
@@ -463,6 +477,7 @@ async def del_force_sub(client: Client, message: Message):
             return await temp.edit("<b>❌ No force-sub channels found.</b>")
         for ch_id in all_channels:
             await Seishiro.remove_fsub_channel(ch_id)
+            invite_pool.invalidate(ch_id)
         return await temp.edit("<b>✅ All force-sub channels have been removed.</b>")
 
     try:
@@ -472,6 +487,7 @@ async def del_force_sub(client: Client, message: Message):
 
     if ch_id in all_channels:
         await Seishiro.remove_fsub_channel(ch_id)
+        invite_pool.invalidate(ch_id)
         try:
             chat = await client.get_chat(ch_id)
             return await temp.edit(f"<b>✅ Channel removed:</b>\n<b>Name:</b> {chat.title}\n<b>ID:</b> <code>{ch_id}</code>")
@@ -515,15 +531,6 @@ async def broadcast_handler(client: Client, m: Message):
                 parse_mode=ParseMode.HTML
             )
         
-        try:
-            all_users = await Seishiro.get_all_users()
-        except Exception as e:
-            logger.error(f"Error fetching users from database: {e}")
-            return await m.reply_text(
-                "<b>❌ Eʀʀᴏʀ ғᴇᴛᴄʜɪɴɢ ᴜsᴇʀs ғʀᴏᴍ ᴅᴀᴛᴀʙᴀsᴇ!</b>",
-                parse_mode=ParseMode.HTML
-            )
-        
         broadcast_msg = m.reply_to_message
         
         try:
@@ -532,95 +539,14 @@ async def broadcast_handler(client: Client, m: Message):
             logger.error(f"Error sending broadcast start message: {e}")
             return
         
-        done = 0
-        failed = 0
-        success = 0
-        start_time = time.time()
-        
         try:
             total_users = await Seishiro.total_users_count()
         except Exception as e:
             logger.error(f"Error getting total users count: {e}")
             total_users = 0
-        
-        try:
-            async for user in all_users:
-                try:
-                    sts = await send_msg(user['_id'], broadcast_msg)
-                    if sts == 200:
-                        success += 1
-                    else:
-                        failed += 1
-                    if sts == 400:
-                        try:
-                            await Seishiro.delete_user(user['_id'])
-                        except Exception as e:
-                            logger.error(f"Error deleting user {user['_id']}: {e}")
-                    done += 1
-                    
-                    # Update status every 20 users
-                    if done % 20 == 0:
-                        try:
-                            await sts_msg.edit(
-                                f"Broadcast In Progress: \n\n"
-                                f"Total Users {total_users} \n"
-                                f"Completed : {done} / {total_users}\n"
-                                f"Success : {success}\n"
-                                f"Failed : {failed}"
-                            )
-                        except FloodWait as e:
-                            logger.warning(f"FloodWait during status update: waiting {e.value}s")
-                            await asyncio.sleep(e.value)
-                        except Exception as e:
-                            logger.error(f"Error updating broadcast status: {e}")
-                            
-                except Exception as e:
-                    logger.error(f"Error processing user {user.get('_id', 'unknown')}: {e}")
-                    failed += 1
-                    done += 1
-                    continue
-            
-            # Calculate completion time
-            completed_in = timedelta(seconds=int(time.time() - start_time))
-            
-            # Send final status
-            try:
-                await sts_msg.edit(
-                    f"Bʀᴏᴀᴅᴄᴀꜱᴛ Cᴏᴍᴩʟᴇᴛᴇᴅ: \n"
-                    f"Cᴏᴍᴩʟᴇᴛᴇᴅ Iɴ {completed_in}.\n\n"
-                    f"Total Users {total_users}\n"
-                    f"Completed: {done} / {total_users}\n"
-                    f"Success: {success}\n"
-                    f"Failed: {failed}"
-                )
-            except Exception as e:
-                logger.error(f"Error sending final broadcast status: {e}")
-                # Try sending as new message if edit fails
-                try:
-                    await m.reply_text(
-                        f"Bʀᴏᴀᴅᴄᴀꜱᴛ Cᴏᴍᴩʟᴇᴛᴇᴅ: \n"
-                        f"Cᴏᴍᴩʟᴇᴛᴇᴅ Iɴ {completed_in}.\n\n"
-                        f"Total Users {total_users}\n"
-                        f"Completed: {done} / {total_users}\n"
-                        f"Success: {success}\n"
-                        f"Failed: {failed}"
-                    )
-                except Exception as e2:
-                    logger.error(f"Error sending fallback broadcast status: {e2}")
-                    
-        except Exception as e:
-            logger.error(f"Critical error during broadcast loop: {e}")
-            try:
-                await sts_msg.edit(
-                    f"<b>❌ Bʀᴏᴀᴅᴄᴀsᴛ Fᴀɪʟᴇᴅ!</b>\n\n"
-                    f"Completed: {done}\n"
-                    f"Success: {success}\n"
-                    f"Failed: {failed}\n\n"
-                    f"<blockquote expandable><b>Eʀʀᴏʀ:</b> {str(e)}</blockquote>",
-                    parse_mode=ParseMode.HTML
-                )
-            except:
-                pass
+
+        # Runs in the background; progress goes to sts_msg and /bcast
+        await start_broadcast(client, broadcast_msg, sts_msg, total_users)
                 
     except Exception as e:
         logger.error(f"Fatal error in broadcast_handler: {e}")
@@ -633,29 +559,63 @@ async def broadcast_handler(client: Client, m: Message):
         except:
             pass
 
-async def send_msg(user_id, message):
-    try:
-        await message.copy(chat_id=int(user_id))
-        return 200
-    except FloodWait as e:
-        logger.warning(f"FloodWait for user {user_id}: waiting {e.value}s")
-        await asyncio.sleep(e.value)
-        return await send_msg(user_id, message)
-    except InputUserDeactivated:
-        logger.info(f"{user_id} : Deactivated")
-        return 400
-    except UserIsBlocked:
-        logger.info(f"{user_id} : Blocked The Bot")
-        return 400
-    except PeerIdInvalid:
-        logger.info(f"{user_id} : User ID Invalid")
-        return 400
-    except RPCError as e:
-        logger.error(f"{user_id} : RPC Error - {e}")
-        return 500
-    except Exception as e:
-        logger.error(f"{user_id} : Unexpected error - {e}")
-        return 500
+
+@Client.on_message(filters.command("bcast") & filters.private & admin)
+async def broadcast_jobs(client: Client, m: Message):
+    """/bcast [pause|resume|cancel <job_id>] — list or control broadcast jobs."""
+    args = m.text.split()
+    reply_markup = InlineKeyboardMarkup([[InlineKeyboardButton("ᴄʟᴏsᴇ", callback_data="close")]])
+
+    if len(args) == 1:
+        if not jobs:
+            return await m.reply_text("<b>📭 Nᴏ ʙʀᴏᴀᴅᴄᴀsᴛ ᴊᴏʙs ʀᴜɴɴɪɴɢ.</b>", reply_markup=reply_markup)
+        return await m.reply_text(
+            "\n\n".join(job.progress_text() for job in jobs.values()),
+            reply_markup=reply_markup, parse_mode=ParseMode.HTML
+        )
+
+    if len(args) != 3 or args[1].lower() not in ("pause", "resume", "cancel"):
+        return await m.reply_text(
+            "<b>Usᴇ ɪᴛ ʟɪᴋᴇ ᴛʜɪs:</b> <code>/bcast</code>\n"
+            "<b>Oʀ:</b> <code>/bcast pause|resume|cancel &lt;ᴊᴏʙ_ɪᴅ&gt;</code>",
+            reply_markup=reply_markup
+        )
+
+    action, job_id = args[1].lower(), args[2]
+    job = jobs.get(job_id)
+    if job is None:
+        return await m.reply_text(f"<b>❌ Nᴏ ᴀᴄᴛɪᴠᴇ ᴊᴏʙ <code>{job_id}</code>.</b>", reply_markup=reply_markup)
+
+    if action == "pause":
+        job.pause()
+    elif action == "cancel":
+        job.cancel()
+    elif job.active:
+        return await m.reply_text("<b>⏳ Sᴛɪʟʟ ᴘᴀᴜsɪɴɢ, ᴛʀʏ ᴀɢᴀɪɴ ɪɴ ᴀ ғᴇᴡ sᴇᴄᴏɴᴅs.</b>", reply_markup=reply_markup)
+    elif job.status == "paused":
+        job.start()
+
+    await m.reply_text(job.progress_text(), reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+
+@Client.on_message(filters.command("traces") & filters.private & admin)
+async def slow_traces(client: Client, m: Message):
+    """Slowest recently traced updates, with where their time went."""
+    slowest = tracer.slowest(5)
+    if not slowest:
+        return await m.reply_text(
+            f"<b>📭 Nᴏ ᴛʀᴀᴄᴇᴅ ᴜᴘᴅᴀᴛᴇs ʏᴇᴛ</b> (sᴀᴍᴘʟᴇ ʀᴀᴛᴇ {tracer.sample_rate:.0%})"
+        )
+
+    text = f"<b>🐢 Sʟᴏᴡᴇsᴛ ᴏғ {len(tracer.recent)} ᴛʀᴀᴄᴇᴅ ᴜᴘᴅᴀᴛᴇs</b>\n\n"
+    for idx, trace in enumerate(slowest, 1):
+        when = datetime.fromtimestamp(trace.wall).strftime('%H:%M:%S')
+        text += f"<b>{idx}. {trace.handler}</b> — <code>{trace.duration * 1000:.0f}ms</code> (ᴜsᴇʀ <code>{trace.user_id}</code>, {when})\n"
+        for name, (count, total) in list(trace.breakdown().items())[:6]:
+            text += f"   └ {name} ×{count}: <code>{total * 1000:.0f}ms</code>\n"
+        text += "\n"
+
+    await m.reply_text(text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("ᴄʟᴏsᴇ", callback_data="close")]]))
+
 
 @Client.on_message(filters.command(["stats", "status"]) & filters.private & admin)
 async def get_stats(bot, message):
@@ -665,5 +625,14 @@ async def get_stats(bot, message):
     st = await message.reply('<b><i>ᴘʟᴇᴀsᴇ ᴡᴀɪᴛ..</i></b>')
     end_t = time.time()
     time_taken_s = (end_t - start_t) * 1000
-    await st.edit(text=f"**Bᴏᴛ Sᴛᴀᴛᴜꜱ:** \n\n**➲ Bᴏᴛ Uᴘᴛɪᴍᴇ:** `{uptime}` \n**➲ Pɪɴɢ:** `{time_taken_s:.3f} ms` \n**➲ Vᴇʀsɪᴏɴ:** 2.0.0 \n**➲ Tᴏᴛᴀʟ Uꜱᴇʀꜱ:** `{total_users}`")
+    sched = send_scheduler.stats()
+    prefs = Seishiro.pref_cache.stats()
+    fsub = membership.stats()
+    await st.edit(text=f"**Bᴏᴛ Sᴛᴀᴛᴜꜱ:** \n\n**➲ Bᴏᴛ Uᴘᴛɪᴍᴇ:** `{uptime}` \n**➲ Pɪɴɢ:** `{time_taken_s:.3f} ms` \n**➲ Vᴇʀsɪᴏɴ:** 2.0.0 \n**➲ Tᴏᴛᴀʟ Uꜱᴇʀꜱ:** `{total_users}`"
+                       f"\n**➲ Sᴇɴᴅ Qᴜᴇᴜᴇ:** `{sched['queue_depth']}` ({sched['waiting_jobs']} jobs)"
+                       f"\n**➲ Qᴜᴇᴜᴇ Wᴀɪᴛ:** `avg {sched['avg_wait']:.2f}s / max {sched['max_wait']:.2f}s`"
+                       f"\n**➲ FʟᴏᴏᴅWᴀɪᴛs:** `{sum(sched['floodwaits'].values())}` ({sched['throttled_chats']} chats throttled)"
+                       f"\n**➲ Lɪᴠᴇ Tɪᴍᴇʀs:** `{timer_wheel.stats()['live_timers']}`"
+                       f"\n**➲ Pʀᴇғ Cᴀᴄʜᴇ:** `{prefs['hit_rate']:.1%}` hit ({prefs['hits']}/{prefs['hits'] + prefs['misses']})"
+                       f"\n**➲ Fsᴜʙ Cᴀᴄʜᴇ:** `{fsub['hit_rate']:.1%}` hit ({fsub['hits']}/{fsub['hits'] + fsub['misses']})")
         
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from config import *
+from Plugins.timers import timer_wheel
+
+logger = logging.getLogger(__name__)
+
+
+class InviteLinkPool:
+    """
+    Reusable force-sub invite links, one per channel and link type.
+
+    Every blocked user of a channel gets the same link until it is
+    FSUB_LINK_MARGIN seconds from expiry. A link that was handed out is
+    replaced in the background just before it gets there; a link nobody
+    used is simply dropped. Concurrent requests for a missing link share a
+    single create_chat_invite_link call.
+    """
+
+    def __init__(self, expiry=FSUB_LINK_EXPIRY, margin=FSUB_LINK_MARGIN):
+        self.expiry = expiry
+        self.margin = min(margin, expiry / 2) if expiry else 0
+        self.links = {}      # (chat_id, join_request) → {'link', 'expires_at', 'used'}
+        self.creating = {}   # (chat_id, join_request) → Future
+        self.client = None
+        self.created = 0
+        self.reused = 0
+
+    async def get(self, client, chat_id, join_request: bool) -> str:
+        self.client = client
+        key = (chat_id, join_request)
+        entry = self.links.get(key)
+        if entry is not None and (not self.expiry or entry['expires_at'] - time.monotonic() > self.margin):
+            entry['used'] = True
+            self.reused += 1
+            return entry['link']
+        return await self._create(key)
+
+    def invalidate(self, chat_id):
+        for join_request in (True, False):
+            self.links.pop((chat_id, join_request), None)
+            timer_wheel.cancel(("invite", chat_id, join_request))
+
+    def stats(self) -> dict:
+        return {"links": len(self.links), "created": self.created, "reused": self.reused}
+
+    # ==================== INTERNALS ====================
+
+    async def _create(self, key):
+        future = self.creating.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self.creating[key] = asyncio.get_running_loop().create_future()
+        try:
+            chat_id, join_request = key
+            invite = await self.client.create_chat_invite_link(
+                chat_id=chat_id,
+                creates_join_request=join_request,
+                expire_date=datetime.utcnow() + timedelta(seconds=self.expiry) if self.expiry else None
+            )
+            self.created += 1
+            self.links[key] = {
+                'link': invite.invite_link,
+                'expires_at': time.monotonic() + self.expiry if self.expiry else float("inf"),
+                'used': True,
+            }
+            if self.expiry:
+                timer_wheel.call_later(self.expiry - self.margin, lambda: self._refresh(key), key=("invite",) + key)
+            future.set_result(invite.invite_link)
+            return invite.invite_link
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved: no waiters is not an error
+            raise
+        finally:
+            del self.creating[key]
+
+    async def _refresh(self, key):
+        entry = self.links.get(key)
+        if entry is None or not entry['used']:
+            self.links.pop(key, None)
+            return
+        try:
+            await self._create(key)
+            self.links[key]['used'] = False
+        except Exception as e:
+            logger.error(f"Error refreshing invite link for {key[0]}: {e}")
+            self.links.pop(key, None)
+
+
+invite_pool = InviteLinkPool()
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from bisect import bisect_left, insort
+
+from Database.database import Seishiro
+
+logger = logging.getLogger(__name__)
+
+LOAD_ATTEMPTS = 3
+
+
+class Leaderboard:
+    """
+    Sequence counts kept in memory, ordered for the leaderboard.
+
+    `order` is a sorted list of (-count, user_id), so the top N is a slice
+    and a user's rank is one bisect. Warmed from Mongo on first use and
+    updated by record() whenever /esequence bumps a count.
+
+    record() runs after its `$inc` has landed, so a count recorded while
+    the load is reading may or may not already be in what it read. Rather
+    than guess, the load reads again until one read completes with no
+    record() during it, up to LOAD_ATTEMPTS reads. If writes keep racing
+    the last read, it is kept and the increments recorded during it are
+    dropped: counts can then be low by those increments until the next
+    restart, but are never counted twice. Users removed from the database
+    are dropped with forget().
+    """
+
+    def __init__(self):
+        self.counts = {}     # user_id → sequence_count
+        self.mentions = {}   # user_id → last known mention
+        self.order = []      # sorted (-count, user_id)
+        self.loaded = False
+        self.buffered = None  # [(user_id, added)] recorded during the current read
+        self.lock = asyncio.Lock()
+
+    async def load(self):
+        async with self.lock:
+            if self.loaded:
+                return
+            try:
+                for attempt in range(1, LOAD_ATTEMPTS + 1):
+                    self.buffered = []
+                    docs = await Seishiro.get_sequence_counts()
+                    if docs is None:
+                        raise RuntimeError("could not load sequence counts")
+                    if not self.buffered or attempt == LOAD_ATTEMPTS:
+                        break
+                if self.buffered:
+                    logger.warning(f"Leaderboard dropped {len(self.buffered)} increment(s) "
+                                   f"that raced every load attempt")
+                self.counts = {doc["_id"]: doc["sequence_count"] for doc in docs}
+                for doc in docs:
+                    if doc.get("mention"):
+                        self.mentions[doc["_id"]] = doc["mention"]
+                self.order = sorted((-count, user_id) for user_id, count in self.counts.items())
+                self.loaded = True
+            finally:
+                self.buffered = None
+            logger.info(f"Leaderboard loaded with {len(self.order)} user(s)")
+
+    def record(self, user_id, added, mention=None):
+        """Mirror a `$inc: {sequence_count: added}` for `user_id`."""
+        if mention:
+            self.mentions[user_id] = mention
+        if added <= 0:
+            return
+        if self.loaded:
+            self._add(user_id, added)
+        elif self.buffered is not None:
+            self.buffered.append((user_id, added))
+
+    def forget(self, user_ids):
+        """Drop users deleted from the database."""
+        for user_id in user_ids:
+            self.mentions.pop(user_id, None)
+            count = self.counts.pop(user_id, 0)
+            if count:
+                del self.order[bisect_left(self.order, (-count, user_id))]
+
+    def _add(self, user_id, added):
+        old = self.counts.get(user_id, 0)
+        if old:
+            del self.order[bisect_left(self.order, (-old, user_id))]
+        self.counts[user_id] = old + added
+        insort(self.order, (-(old + added), user_id))
+
+    async def top(self, limit=10):
+        """[(user_id, count, mention)] for the best `limit` users."""
+        await self.load()
+        return [
+            (user_id, -neg, self.mentions.get(user_id, f"User {user_id}"))
+            for neg, user_id in self.order[:limit]
+        ]
+
+    async def rank(self, user_id):
+        """(rank, count) for `user_id`; rank is None if they have no count yet."""
+        await self.load()
+        count = self.counts.get(user_id, 0)
+        if not count:
+            return None, 0
+        # Users with strictly more files, plus one.
+        return bisect_left(self.order, (-count,)) + 1, count
+
+
+leaderboard = Leaderboard()
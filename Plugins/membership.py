@@ -0,0 +1,114 @@
+import asyncio
+import logging
+
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.errors.exceptions.bad_request_400 import UserNotParticipant
+
+from config import *
+from Database.database import Seishiro, TTLCache
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBED = {
+    ChatMemberStatus.OWNER,
+    ChatMemberStatus.ADMINISTRATOR,
+    ChatMemberStatus.MEMBER
+}
+
+
+class MembershipCache:
+    """
+    Remembers whether a user satisfies a force-sub channel.
+
+    Confirmed members are kept for FSUB_MEMBER_TTL seconds, non-members for
+    only FSUB_NONMEMBER_TTL so a fresh join is noticed quickly. A pending
+    join request counts in request mode but is kept for FSUB_REQUEST_TTL
+    only, since a decline sends no update. Chat member updates and join
+    requests overwrite entries as they arrive, so most checks never reach
+    get_chat_member.
+    """
+
+    def __init__(self, maxsize=FSUB_CACHE_SIZE, member_ttl=FSUB_MEMBER_TTL, nonmember_ttl=FSUB_NONMEMBER_TTL,
+                 request_ttl=FSUB_REQUEST_TTL, concurrency=FSUB_CONCURRENCY):
+        self.cache = TTLCache(maxsize, member_ttl)
+        self.nonmember_ttl = nonmember_ttl
+        self.request_ttl = request_ttl
+        self.concurrency = concurrency
+
+    async def is_member(self, client, channel_id, user_id, fresh=False) -> bool:
+        """True if `user_id` joined `channel_id` (or has a pending request in request mode)."""
+        if not fresh:
+            found, subscribed = self.cache.get((channel_id, user_id))
+            if found:
+                return subscribed
+        requested = False
+        try:
+            member = await client.get_chat_member(channel_id, user_id)
+            subscribed = member.status in SUBSCRIBED
+        except UserNotParticipant:
+            mode = await Seishiro.get_channel_mode(channel_id)
+            subscribed = requested = mode == "on" and await Seishiro.req_user_exist(channel_id, user_id)
+        except Exception as e:
+            # Not cached: a transient error shouldn't lock anyone out.
+            logger.error(f"Error checking membership of {user_id} in {channel_id}: {e}")
+            return False
+        self.remember(channel_id, user_id, subscribed, requested)
+        return subscribed
+
+    async def first_missing(self, client, channel_ids, user_id, fresh=False):
+        """
+        Return a channel `user_id` is not subscribed to, or None if they are in all of them.
+
+        Cached answers are used first; the rest are checked concurrently (at
+        most `concurrency` RPCs at once) and the first miss cancels the others.
+        """
+        unknown = channel_ids
+        if not fresh:
+            unknown = []
+            for cid in channel_ids:
+                found, subscribed = self.cache.get((cid, user_id))
+                if not found:
+                    unknown.append(cid)
+                elif not subscribed:
+                    return cid
+        if not unknown:
+            return None
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def check(cid):
+            async with semaphore:
+                # Already known to be uncached (or deliberately bypassed)
+                return cid, await self.is_member(client, cid, user_id, fresh=True)
+
+        tasks = [asyncio.create_task(check(cid)) for cid in unknown]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                cid, subscribed = await next_done
+                if not subscribed:
+                    return cid
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def remember(self, channel_id, user_id, subscribed: bool, requested: bool = False):
+        """Cache an answer; `requested` marks a pass granted by a pending join request."""
+        if requested:
+            ttl = self.request_ttl
+        else:
+            ttl = None if subscribed else self.nonmember_ttl
+        self.cache.set((channel_id, user_id), subscribed, ttl)
+
+    def forget(self, channel_id, user_id):
+        self.cache.delete((channel_id, user_id))
+
+    def clear(self):
+        """Drop everything, e.g. after a channel or its mode changed."""
+        self.cache.data.clear()
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+membership = MembershipCache()
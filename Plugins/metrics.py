@@ -0,0 +1,160 @@
+import inspect
+import logging
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from pyrogram.errors import FloodWait
+
+from Plugins import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+registry = []
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values = {}   # label values → total
+        registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self.values.items():
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is one bisect and two additions."""
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = tuple(buckets)
+        self.values = {}   # label values → [per-bucket counts..., +Inf count, sum]
+        registry.append(self)
+
+    def observe(self, value, *labels):
+        row = self.values.get(labels)
+        if row is None:
+            row = self.values[labels] = [0] * (len(self.buckets) + 2)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        for labels, row in self.values.items():
+            cumulative = 0
+            for bound, count in zip(bounds, row):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labels + ('le',), labels + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {row[-1]}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+
+
+class Gauge:
+    """Read at scrape time from `func`, so nothing is paid between scrapes."""
+
+    def __init__(self, name, help, func):
+        self.name, self.help, self.func = name, help, func
+        registry.append(self)
+
+    def render(self):
+        try:
+            value = self.func()
+        except Exception as e:
+            logger.error(f"Error reading gauge {self.name}: {e}")
+            return
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {value}"
+
+
+def render() -> str:
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ==================== BOT METRICS ====================
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Time spent in update handlers", ("handler",))
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handler calls that raised", ("handler",))
+DB_SECONDS = Histogram("bot_db_seconds", "Time spent in Master database operations", ("op",))
+DB_ERRORS = Counter("bot_db_errors_total", "Master database operations that raised", ("op",))
+TELEGRAM_SECONDS = Histogram("bot_telegram_seconds", "Time spent in Telegram API calls", ("method",))
+TELEGRAM_ERRORS = Counter("bot_telegram_errors_total", "Telegram API calls that raised", ("method",))
+FLOODWAITS = Counter("bot_floodwait_total", "FloodWait errors returned by Telegram", ("method",))
+FLOODWAIT_SLEPT = Counter("bot_floodwait_sleep_seconds_total", "Seconds slept because of FloodWait", ("where",))
+
+
+def timed(func, histogram, errors, label):
+    """Wrap coroutine function `func` to record its latency under `label`."""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            errors.inc(label)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            histogram.observe(duration, label)
+            tracing.record(label, start, duration)
+    return wrapper
+
+
+def instrument(client, master):
+    """
+    Time every registered handler, every Master coroutine and every
+    Telegram RPC, and trace sampled updates through them. Call once after
+    the client has started (plugins loaded).
+    """
+    for group in client.dispatcher.groups.values():
+        for handler in group:
+            if inspect.iscoroutinefunction(handler.callback):
+                callback = timed(handler.callback, HANDLER_SECONDS, HANDLER_ERRORS, handler.callback.__name__)
+                handler.callback = tracing.traced_handler(callback)
+
+    for name, _ in inspect.getmembers(type(master), inspect.iscoroutinefunction):
+        if not name.startswith("_"):
+            setattr(master, name, timed(getattr(master, name), DB_SECONDS, DB_ERRORS, name))
+
+    invoke = client.invoke
+
+    @wraps(invoke)
+    async def timed_invoke(query, *args, **kwargs):
+        method = type(query).__name__
+        start = time.perf_counter()
+        try:
+            return await invoke(query, *args, **kwargs)
+        except FloodWait:
+            FLOODWAITS.inc(method)
+            TELEGRAM_ERRORS.inc(method)
+            raise
+        except Exception:
+            TELEGRAM_ERRORS.inc(method)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            TELEGRAM_SECONDS.observe(duration, method)
+            tracing.record(method, start, duration)
+
+    client.invoke = timed_invoke
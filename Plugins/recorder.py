@@ -0,0 +1,103 @@
+import asyncio
+import gzip
+import json
+import logging
+import time
+
+from pyrogram import Client
+
+from config import *
+from Plugins.timers import timer_wheel
+
+logger = logging.getLogger(__name__)
+
+MEDIA_KINDS = ('document', 'video', 'audio', 'photo', 'voice', 'animation', 'sticker')
+
+
+def message_record(message) -> dict:
+    """What replay needs to rebuild `message`: ids, text and file names, never file ids or media."""
+    record = {
+        "ts": time.time(),
+        "id": message.id,
+        "chat": message.chat.id if message.chat else None,
+        "user": message.from_user.id if message.from_user else None,
+    }
+    if message.text:
+        record["text"] = message.text
+    if message.caption:
+        record["caption"] = message.caption
+    for kind in MEDIA_KINDS:
+        media = getattr(message, kind, None)
+        if media is not None:
+            record["media"] = kind
+            record["file_name"] = getattr(media, "file_name", None)
+            record["file_size"] = getattr(media, "file_size", None)
+            break
+    if message.reply_to_message_id:
+        record["reply_to"] = message.reply_to_message_id
+    if message.forward_origin:
+        record["forwarded"] = True
+    return record
+
+
+class UpdateRecorder:
+    """
+    Opt-in recorder of incoming messages for offline replay.
+
+    Each message becomes one JSON line in UPDATE_RECORD_FILE. Lines are
+    buffered and appended as a new gzip member once FLUSH_LINES are
+    waiting, and a timer on the shared wheel writes the rest at most
+    FLUSH_INTERVAL seconds after they arrived. gzip readers treat the
+    members as one stream, so the file stays readable while the bot is
+    still writing it. The compression and write run in a worker thread.
+    """
+
+    FLUSH_LINES = 200
+    FLUSH_INTERVAL = 5
+
+    def __init__(self, path=UPDATE_RECORD_FILE):
+        self.path = path
+        self.buffer = []
+        self.recorded = 0
+        self.timer = None
+        self.lock = asyncio.Lock()
+
+    def record(self, message):
+        try:
+            self.buffer.append(message_record(message))
+        except Exception as e:
+            logger.error(f"Error recording update: {e}")
+            return
+        self.recorded += 1
+        if len(self.buffer) >= self.FLUSH_LINES:
+            asyncio.create_task(self.flush())
+        elif self.timer is None or self.timer.done():
+            self.timer = timer_wheel.call_later(self.FLUSH_INTERVAL, self.flush)
+
+    async def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.buffer or not self.path:
+            return
+        lines, self.buffer = self.buffer, []
+        text = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+        async with self.lock:   # one gzip member at a time, in order
+            try:
+                await asyncio.to_thread(self._append, text)
+            except Exception as e:
+                logger.error(f"Error writing recorded updates: {e}")
+
+    def _append(self, text):
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write(text)
+
+
+recorder = UpdateRecorder()
+
+
+if UPDATE_RECORD_FILE:
+    # Group -1 runs before every other handler and doesn't stop propagation
+    @Client.on_message(group=-1)
+    async def record_update(client: Client, message):
+        recorder.record(message)
@@ -1,4 +1,5 @@
 from aiohttp import web
+from Plugins import metrics
 
 routes = web.RouteTableDef()
 
@@ -6,6 +7,10 @@ routes = web.RouteTableDef()
 async def root_route_handler(request):
     return web.json_response("Dev - Abhi,Master,Seishiro")
 
+@routes.get("/metrics")
+async def metrics_handler(request):
+    return web.Response(text=metrics.render(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
 async def web_server():
     web_app = web.Application(client_max_size=30000000)
     web_app.add_routes(routes)
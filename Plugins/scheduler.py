@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict, deque
+
+from pyrogram.errors import FloodWait
+
+from config import *
+from Database.database import Seishiro
+from Plugins.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `capacity` banked."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float, cost: float = 1) -> float:
+        """
+        Seconds until `cost` tokens are available (0 if they are already).
+        A cost above the capacity only waits for a full bucket; take() then
+        runs it into debt, which later requests wait out.
+        """
+        self._refill(now)
+        needed = min(cost, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def take(self, now: float, cost: float = 1):
+        self._refill(now)
+        self.tokens -= cost
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class RateController:
+    """
+    AIMD send-rate learning per target chat.
+
+    A FloodWait halves the chat's rate (down to SEND_MIN_RATE); after
+    SEND_PROBE_INTERVAL seconds without one, the rate creeps back up by a
+    tenth of the default on each probe. Learned rates are written back to
+    Mongo in batches and reloaded on start.
+    """
+
+    DECREASE = 0.5
+    INCREASE = 0.1
+
+    def __init__(self, min_rate=SEND_MIN_RATE, probe_interval=SEND_PROBE_INTERVAL):
+        self.min_rate = min_rate
+        self.probe_interval = probe_interval
+        self.learned = {}       # chat_id → {'rate', 'default', 'last_change'}
+        self.dirty = set()
+        self.floodwaits = Counter()      # method → events
+        self.flood_seconds = Counter()   # method → seconds told to wait
+
+    def rate_for(self, chat_id, default: float) -> float:
+        entry = self.learned.get(chat_id)
+        if entry is None:
+            return default
+        entry['default'] = default
+        return entry['rate']
+
+    def on_floodwait(self, chat_id, method: str, seconds: int, current: float) -> float:
+        """Record a FloodWait and return the decreased rate for `chat_id`."""
+        self.floodwaits[method] += 1
+        self.flood_seconds[method] += seconds
+
+        entry = self.learned.setdefault(chat_id, {'rate': current, 'default': current})
+        entry['rate'] = max(self.min_rate, min(entry['rate'], current) * self.DECREASE)
+        entry['last_change'] = time.monotonic()
+        self.dirty.add(chat_id)
+        logger.info(f"FloodWait on {method} for {chat_id}: rate lowered to {entry['rate']:.3f}/s")
+        return entry['rate']
+
+    def probe(self, chat_id, now: float):
+        """Return a raised rate if `chat_id` has been quiet long enough, else None."""
+        entry = self.learned.get(chat_id)
+        if entry is None or now - entry.get('last_change', 0) < self.probe_interval:
+            return None
+
+        entry['rate'] = min(entry['default'], entry['rate'] + entry['default'] * self.INCREASE)
+        entry['last_change'] = now
+        self.dirty.add(chat_id)
+        if entry['rate'] >= entry['default']:
+            del self.learned[chat_id]
+        return entry['rate']
+
+    async def load(self):
+        now = time.monotonic()
+        for doc in await Seishiro.get_send_rates():
+            self.learned[doc['_id']] = {
+                'rate': doc['rate'],
+                'default': doc.get('default', doc['rate']),
+                'last_change': now,
+            }
+        logger.info(f"Loaded {len(self.learned)} learned send rates")
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        dirty, self.dirty = self.dirty, set()
+        rates = {chat_id: self.learned.get(chat_id) for chat_id in dirty}
+        if not await Seishiro.save_send_rates(rates):
+            self.dirty |= dirty
+
+    def stats(self) -> dict:
+        return {
+            "floodwaits": dict(self.floodwaits),
+            "flood_seconds": dict(self.flood_seconds),
+            "throttled_chats": len(self.learned),
+        }
+
+
+class SendScheduler:
+    """
+    Central gate for outbound Telegram sends.
+
+    Every send waits for a token from the global bucket and from the bucket
+    of its target chat (private chats and groups/channels get different
+    budgets). Waiters are queued per owner (the user whose job the send
+    belongs to) and served round-robin, so one huge /esequence can't starve
+    a small one. Chat budgets adapt to FloodWaits through RateController.
+
+    A request that delivers several messages (a media group, a bulk
+    forward) passes `cost` and takes that many tokens. Status replies of a
+    running delivery go through here too; one-off command replies don't.
+    """
+
+    MAX_CHAT_BUCKETS = 10000
+    FLUSH_INTERVAL = 30
+
+    def __init__(self, global_rate=SEND_GLOBAL_RATE, private_rate=SEND_PRIVATE_RATE,
+                 channel_rate=SEND_CHANNEL_RATE, burst=SEND_CHAT_BURST):
+        self.global_bucket = TokenBucket(global_rate, max(1, global_rate))
+        self.private_rate = private_rate
+        self.channel_rate = channel_rate
+        self.burst = burst
+        self.chat_buckets = OrderedDict()  # chat_id → TokenBucket
+        self.queues = OrderedDict()        # owner → deque[(chat_id, cost, future, enqueued_at)]
+        self.wakeup = None
+        self.task = None
+        self.flush_task = None
+        self.controller = RateController()
+
+        self.granted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    # ==================== PUBLIC API ====================
+
+    async def acquire(self, owner, chat_id, cost=1):
+        """Wait until `owner` may send `cost` messages to `chat_id`."""
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = loop.create_task(self._dispatch())
+
+        future = loop.create_future()
+        self.queues.setdefault(owner, deque()).append((chat_id, cost, future, time.monotonic()))
+        self.wakeup.set()
+        await future
+
+    async def run(self, owner, target, func, *args, cost=1, **kwargs):
+        """Wait for `cost` send slots to `target`, then call func(*args, **kwargs)."""
+        await self.acquire(owner, target, cost)
+        try:
+            return await func(*args, **kwargs)
+        except FloodWait as e:
+            self.on_floodwait(target, getattr(func, "__name__", "unknown"), e.value)
+            raise
+
+    def on_floodwait(self, chat_id, method, seconds):
+        """Slow `chat_id` down and hold its bucket closed for the wait Telegram asked for."""
+        now = time.monotonic()
+        bucket = self._chat_bucket(chat_id, now)
+        bucket.rate = self.controller.on_floodwait(chat_id, method, seconds, bucket.rate)
+        bucket.tokens = min(bucket.tokens, 1 - seconds * bucket.rate)
+        bucket.updated = now
+
+    async def load_rates(self):
+        """Restore learned rates and start the periodic write-back."""
+        await self.controller.load()
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            try:
+                await self.controller.flush()
+            except Exception as e:
+                logger.error(f"Error saving learned send rates: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": sum(len(q) for q in self.queues.values()),
+            "waiting_jobs": len(self.queues),
+            "granted": self.granted,
+            "avg_wait": self.total_wait / self.granted if self.granted else 0.0,
+            "max_wait": self.max_wait,
+            "chat_buckets": len(self.chat_buckets),
+            **self.controller.stats(),
+        }
+
+    # ==================== INTERNALS ====================
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            default = self.private_rate if chat_id > 0 else self.channel_rate
+            rate = self.controller.rate_for(chat_id, default)
+            bucket = self.chat_buckets[chat_id] = TokenBucket(rate, self.burst)
+            if len(self.chat_buckets) > self.MAX_CHAT_BUCKETS:
+                self._prune_buckets(now)
+        else:
+            self.chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    def _prune_buckets(self, now):
+        # Oldest-used first; a full bucket carries no state worth keeping.
+        for chat_id in list(self.chat_buckets)[:len(self.chat_buckets) // 2]:
+            if self.chat_buckets[chat_id].idle(now) and chat_id not in self.controller.learned:
+                del self.chat_buckets[chat_id]
+
+    def _grant_next(self, now) -> float:
+        """Grant one waiter if possible. Returns 0 on success, else seconds to wait."""
+        global_delay = self.global_bucket.delay(now)
+        if global_delay > 0:
+            return global_delay
+
+        soonest = float("inf")
+        for owner in list(self.queues):
+            queue = self.queues[owner]
+            while queue and queue[0][2].done():  # waiter was cancelled
+                queue.popleft()
+            if not queue:
+                del self.queues[owner]
+                continue
+
+            chat_id, cost, future, enqueued_at = queue[0]
+            bucket = self._chat_bucket(chat_id, now)
+            delay = max(bucket.delay(now, cost), self.global_bucket.delay(now, cost))
+            if delay > 0:
+                soonest = min(soonest, delay)
+                continue
+
+            queue.popleft()
+            bucket.take(now, cost)
+            self.global_bucket.take(now, cost)
+            raised = self.controller.probe(chat_id, now)
+            if raised is not None:
+                bucket.rate = raised
+            future.set_result(None)
+
+            waited = now - enqueued_at
+            self.granted += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+            if queue:
+                self.queues.move_to_end(owner)
+            else:
+                del self.queues[owner]
+            return 0.0
+        return soonest
+
+    async def _dispatch(self):
+        while True:
+            # Cleared before looking at the queues so an acquire() that
+            # lands while we sleep always wakes us up.
+            self.wakeup.clear()
+            try:
+                delay = self._grant_next(time.monotonic())
+            except Exception as e:
+                logger.error(f"Error in send scheduler: {e}")
+                delay = 1.0
+
+            if delay == 0:
+                await asyncio.sleep(0)
+                continue
+            try:
+                timeout = None if delay == float("inf") else delay
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+send_scheduler = SendScheduler()
+
+Gauge("bot_send_queue_depth", "Sends waiting for a rate-limit slot", lambda: send_scheduler.stats()["queue_depth"])
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+
+from config import *
+from Database.database import Seishiro
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """
+    Write-behind persistence for sequence sessions.
+
+    Changes are buffered per user and coalesced: a session start or end
+    replaces whatever was buffered before it, and file appends are merged
+    into one $push. The buffer is written with a single bulk_write every
+    SESSION_FLUSH_INTERVAL seconds, or sooner once SESSION_FLUSH_SIZE files
+    are waiting, so collecting a file never waits on Mongo. Buffered files
+    are FileEntry records, stored through their to_doc().
+    """
+
+    def __init__(self, interval=SESSION_FLUSH_INTERVAL, max_pending=SESSION_FLUSH_SIZE):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending = {}       # user_id → {'reset', 'delete', 'mode', 'files'}
+        self.pending_files = 0
+        self.restorable = None  # users with a saved session at startup (None = unknown)
+        self.lock = asyncio.Lock()
+        self.task = None
+
+    # ==================== BUFFERING ====================
+
+    def start(self, user_id, mode):
+        self._forget(user_id)
+        self._drop(user_id)
+        self.pending[user_id] = {'reset': True, 'delete': False, 'mode': mode, 'files': []}
+        self._ensure_running()
+
+    def append(self, user_id, entries):
+        change = self.pending.setdefault(user_id, {'reset': False, 'delete': False, 'mode': None, 'files': []})
+        change['files'].extend(entries)
+        self.pending_files += len(entries)
+        self._ensure_running()
+        if self.pending_files >= self.max_pending:
+            asyncio.create_task(self.flush())
+
+    def end(self, user_id):
+        self._forget(user_id)
+        self._drop(user_id)
+        self.pending[user_id] = {'reset': False, 'delete': True, 'mode': None, 'files': []}
+        self._ensure_running()
+
+    def _drop(self, user_id):
+        change = self.pending.pop(user_id, None)
+        if change:
+            self.pending_files -= len(change['files'])
+
+    # ==================== LOADING ====================
+
+    async def warm(self):
+        """Remember which users have a saved session, so nobody else costs a read."""
+        self.restorable = set(await Seishiro.get_sequence_session_ids())
+        logger.info(f"{len(self.restorable)} sequence session(s) can be restored")
+
+    async def load(self, user_id):
+        """Fetch a session saved before a restart, at most once per user."""
+        if self.restorable is not None:
+            if user_id not in self.restorable:
+                return None
+            self.restorable.discard(user_id)
+        return await Seishiro.get_sequence_session(user_id)
+
+    def _forget(self, user_id):
+        if self.restorable is not None:
+            self.restorable.discard(user_id)
+
+    # ==================== FLUSHING ====================
+
+    def _ensure_running(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing sequence sessions: {e}")
+
+    async def flush(self):
+        async with self.lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, {}
+            self.pending_files = 0
+
+            docs = {
+                user_id: {**change, 'files': [entry.to_doc() for entry in change['files']]}
+                for user_id, change in batch.items()
+            }
+            failed = await Seishiro.save_sequence_sessions(docs)
+            if not failed:
+                return
+
+            # Put the failed changes back underneath anything newer. Changes
+            # that were applied are dropped, or their $push would repeat.
+            for user_id in failed:
+                old = batch[user_id]
+                new = self.pending.get(user_id)
+                if new is None:
+                    self.pending[user_id] = old
+                elif not (new['reset'] or new['delete']):
+                    new['files'] = old['files'] + new['files']
+                    new['reset'], new['delete'], new['mode'] = old['reset'], old['delete'], old['mode']
+            self.pending_files = sum(len(c['files']) for c in self.pending.values())
+
+
+session_store = SessionStore()
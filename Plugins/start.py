@@ -4,17 +4,24 @@ import logging
 from pyrogram import Client, filters
 from pyrogram.enums import ParseMode, ChatMemberStatus, ChatAction
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, InputMediaPhoto
-from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid, RPCError
-from pyrogram.errors.exceptions.bad_request_400 import UserNotParticipant
-from functools import wraps
-from datetime import datetime, timedelta
+from functools import partial, wraps
 from config import *
-from Database.database import Seishiro
+from Database.database import Seishiro, TTLCache
+from Plugins.bans import ban_list
+from Plugins.invites import invite_pool
+from Plugins.membership import membership
+from Plugins.metrics import HANDLER_SECONDS
+from Plugins.tracing import span
+from Plugins.timers import timer_wheel
 
 logger = logging.getLogger(__name__)
 
-# Initialize chat_data_cache
-chat_data_cache = {}
+# Channel titles/usernames for the fsub prompt, refreshed every CHAT_DATA_TTL seconds
+chat_data_cache = TTLCache(256, CHAT_DATA_TTL)
+
+# (user_id, handler name) → {'messages': [(message, args, kwargs)], 'dropped': n}
+# held for the fsub re-check
+fsub_held = {}
 
 def check_ban(func):
     """Decorator to check if user is banned before executing function"""
@@ -24,7 +31,8 @@ def check_ban(func):
         logger.debug(f"check_ban decorator called for user {user_id}")
         
         try:      
-            is_banned = await Seishiro.is_user_banned(user_id)
+            with span("check_ban"):
+                is_banned = await ban_list.is_banned(user_id)
             
             if is_banned:
                 logger.debug(f"User {user_id} is banned")
@@ -48,47 +56,62 @@ def check_ban(func):
     return wrapper
 
 def check_fsub(func):
+    # check_ban runs before this decorator; the re-check replays held
+    # messages after it, so it goes through check_ban itself
+    ban_checked = check_ban(func)
+
     @wraps(func)
     async def wrapper(client, message, *args, **kwargs):
         user_id = message.from_user.id
         logger.debug(f"check_fsub decorator called for user {user_id}")
 
-        async def is_sub(client, user_id, channel_id):
-            try:
-                member = await client.get_chat_member(channel_id, user_id)
-                return member.status in {
-                    ChatMemberStatus.OWNER,
-                    ChatMemberStatus.ADMINISTRATOR,
-                    ChatMemberStatus.MEMBER
-                }
-            except UserNotParticipant:
-                mode = await Seishiro.get_channel_mode(channel_id) or await Seishiro.get_channel_mode_all(channel_id)
-                if mode == "on":
-                    exists = await Seishiro.req_user_exist(channel_id, user_id)
-                    return exists
-                return False
-            except Exception as e:
-                logger.error(f"Error in is_sub(): {e}")
-                return False
-
-        async def is_subscribed(client, user_id):
+        async def is_subscribed(client, user_id, allow_recheck=True):
             channel_ids = await Seishiro.show_channels()
             if not channel_ids:
                 return True
             if user_id == OWNER_ID:
                 return True
-            for cid in channel_ids:
-                if not await is_sub(client, user_id, cid):
-                    mode = await Seishiro.get_channel_mode(cid)
-                    if mode == "on":
-                        await asyncio.sleep(2)
-                        if await is_sub(client, user_id, cid):
-                            continue
-                    return False
-            return True
+            # The re-check skips the cache so a join made since the prompt counts
+            missing = await membership.first_missing(client, channel_ids, user_id, fresh=not allow_recheck)
+            if missing is None:
+                return True
+            mode = await Seishiro.get_channel_mode(missing)
+            if mode == "on" and allow_recheck:
+                # The join request may land after the prompt: look again off
+                # the handler path and, if it did, run every message held
+                # meanwhile. One timer per user and command, re-armed by each
+                # blocked message, so a forward burst costs one recheck.
+                key = ("fsub", user_id, func.__name__)
+                held = fsub_held.setdefault(key, {'messages': [], 'dropped': 0})
+                if len(held['messages']) < FSUB_HOLD_LIMIT:
+                    held['messages'].append((message, args, kwargs))
+                else:
+                    held['dropped'] += 1
+                timer_wheel.debounce(key, FSUB_RECHECK_DELAY, partial(recheck, key))
+            return False
+
+        async def recheck(key):
+            held = fsub_held.pop(key, None)
+            if not held or not await is_subscribed(client, user_id, allow_recheck=False):
+                return
+            logger.debug(f"User {user_id} joined after the fsub prompt, running {len(held['messages'])} held message(s)")
+            messages = held['messages']
+            if await ban_list.is_banned(user_id):
+                # Banned since the prompt: let check_ban answer once and drop the rest
+                held_message, held_args, held_kwargs = messages[-1]
+                return await ban_checked(client, held_message, *held_args, **held_kwargs)
+            for held_message, held_args, held_kwargs in messages:
+                await ban_checked(client, held_message, *held_args, **held_kwargs)
+            if held['dropped']:
+                await held_message.reply_text(
+                    f"<b>{held['dropped']} ᴍᴇssᴀɢᴇ(s) sᴇɴᴛ ʙᴇғᴏʀᴇ ʏᴏᴜ ᴊᴏɪɴᴇᴅ ᴡᴇʀᴇ ɴᴏᴛ ᴋᴇᴘᴛ, ᴘʟᴇᴀsᴇ sᴇɴᴅ ᴛʜᴇᴍ ᴀɢᴀɪɴ.</b>"
+                )
         
         try:
-            is_sub_status = await is_subscribed(client, user_id)
+            with span("check_fsub"):
+                started = time.perf_counter()
+                is_sub_status = await is_subscribed(client, user_id)
+                HANDLER_SECONDS.observe(time.perf_counter() - started, "check_fsub")
             logger.debug(f"User {user_id} subscribed status: {is_sub_status}")
             
             if not is_sub_status:
@@ -104,6 +127,29 @@ def check_fsub(func):
             return
     return wrapper
 
+async def join_button(client: Client, chat_id, user_id):
+    """The join button row for `chat_id`, or None if the user is already in it."""
+    if await membership.is_member(client, chat_id, user_id):
+        return None
+
+    found, data = chat_data_cache.get(chat_id)
+    if not found:
+        data = await client.get_chat(chat_id)
+        chat_data_cache.set(chat_id, data)
+
+    name = data.title
+    mode = await Seishiro.get_channel_mode(chat_id)
+
+    if mode == "on" and not data.username:
+        link = await invite_pool.get(client, chat_id, join_request=True)
+    else:
+        if data.username:
+            link = f"https://t.me/{data.username}"
+        else:
+            link = await invite_pool.get(client, chat_id, join_request=False)
+
+    return [InlineKeyboardButton(text=name, url=link)]
+
 async def not_joined(client: Client, message: Message):
     logger.debug(f"not_joined function called for user {message.from_user.id}")
     temp = await message.reply("<b><i>ᴡᴀɪᴛ ᴀ sᴇᴄ..</i></b>")
@@ -115,69 +161,35 @@ async def not_joined(client: Client, message: Message):
 
     user_id = message.from_user.id
     buttons = []
-    count = 0
 
     try:
         all_channels = await Seishiro.show_channels()
-        for chat_id in all_channels:
-            await message.reply_chat_action(ChatAction.TYPING)
-
-            is_member = False
-            try:
-                member = await client.get_chat_member(chat_id, user_id)
-                is_member = member.status in {
-                    ChatMemberStatus.OWNER,
-                    ChatMemberStatus.ADMINISTRATOR,
-                    ChatMemberStatus.MEMBER
-                }
-            except UserNotParticipant:
-                is_member = False
-            except Exception as e:
-                is_member = False
-                logger.error(f"Error checking member in not_joined: {e}")
-
-            if not is_member:
-                try:
-                    if chat_id in chat_data_cache:
-                        data = chat_data_cache[chat_id]
-                    else:
-                        data = await client.get_chat(chat_id)
-                        chat_data_cache[chat_id] = data
-
-                    name = data.title
-                    mode = await Seishiro.get_channel_mode(chat_id)
-
-                    if mode == "on" and not data.username:
-                        invite = await client.create_chat_invite_link(
-                            chat_id=chat_id,
-                            creates_join_request=True,
-                            expire_date=datetime.utcnow() + timedelta(seconds=FSUB_LINK_EXPIRY) if FSUB_LINK_EXPIRY else None
-                        )
-                        link = invite.invite_link
-                    else:
-                        if data.username:
-                            link = f"https://t.me/{data.username}"
-                        else:
-                            invite = await client.create_chat_invite_link(
-                                chat_id=chat_id,
-                                expire_date=datetime.utcnow() + timedelta(seconds=FSUB_LINK_EXPIRY) if FSUB_LINK_EXPIRY else None
-                            )
-                            link = invite.invite_link
-
-                    buttons.append([InlineKeyboardButton(text=name, url=link)])
-                    count += 1
-                    try:
-                        await temp.edit(f"<b>{'! ' * count}</b>")
-                    except Exception as e:
-                        logger.warning(f"Failed to edit message in not_joined: {e}")
-
-                except Exception as e:
-                    logger.error(f"Error with chat {chat_id}: {e}")
-                    await temp.edit(
-                        f"<b><i>! Eʀʀᴏʀ, Cᴏɴᴛᴀᴄᴛ ᴅᴇᴠᴇʟᴏᴘᴇʀ ᴛᴏ sᴏʟᴠᴇ ᴛʜᴇ ɪssᴜᴇs @seishiro_obito</i></b>\n"
-                        f"<blockquote expandable><b>Rᴇᴀsᴏɴ:</b> {e}</blockquote>"
-                    )
-                    return
+        await message.reply_chat_action(ChatAction.TYPING)
+
+        # Every channel is looked up at once; button order still follows the channel list.
+        semaphore = asyncio.Semaphore(FSUB_CONCURRENCY)
+
+        async def bounded(chat_id):
+            async with semaphore:
+                return await join_button(client, chat_id, user_id)
+
+        results = await asyncio.gather(*(bounded(chat_id) for chat_id in all_channels), return_exceptions=True)
+
+        for chat_id, result in zip(all_channels, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error with chat {chat_id}: {result}")
+                await temp.edit(
+                    f"<b><i>! Eʀʀᴏʀ, Cᴏɴᴛᴀᴄᴛ ᴅᴇᴠᴇʟᴏᴘᴇʀ ᴛᴏ sᴏʟᴠᴇ ᴛʜᴇ ɪssᴜᴇs @seishiro_obito</i></b>\n"
+                    f"<blockquote expandable><b>Rᴇᴀsᴏɴ:</b> {result}</blockquote>"
+                )
+                return
+            if result:
+                buttons.append(result)
+
+        try:
+            await temp.edit(f"<b>{'! ' * len(buttons)}</b>")
+        except Exception as e:
+            logger.warning(f"Failed to edit message in not_joined: {e}")
 
         try:
             buttons.append([
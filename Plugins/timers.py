@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+
+from config import *
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    """Handle for one scheduled callback. Quacks like the asyncio.Task it replaces."""
+
+    __slots__ = ('wheel', 'key', 'deadline', 'callback', 'cancelled', 'fired')
+
+    def __init__(self, wheel, key, deadline, callback):
+        self.wheel = wheel
+        self.key = key
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+        self.fired = False
+
+    def done(self):
+        return self.cancelled or self.fired
+
+    def cancel(self):
+        if not self.done():
+            self.cancelled = True
+            self.wheel._forget(self)
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel shared by every handler.
+
+    Timers hash into `slots` buckets of `tick` seconds; one background task
+    walks the wheel and runs whatever is due. Pushing a deadline back
+    (debounce) only updates the timer — it is moved to its new bucket the
+    next time its old one comes round — so a burst of 500 files costs 500
+    attribute writes instead of 500 task create/cancel pairs. Coroutine
+    callbacks are started as tasks so a slow one never stalls the wheel.
+    """
+
+    def __init__(self, tick=TIMER_TICK, slots=512):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.keyed = {}     # key → Timer, for debounce()
+        self.live = 0
+        self.origin = time.monotonic()
+        self.position = 0   # last tick processed
+        self.task = None
+
+    # ==================== PUBLIC API ====================
+
+    def call_later(self, delay, callback, key=None):
+        """Run callback() (sync or async) after `delay` seconds."""
+        timer = Timer(self, key, time.monotonic() + delay, callback)
+        if key is not None:
+            old = self.keyed.get(key)
+            if old is not None:
+                old.cancel()
+            self.keyed[key] = timer
+        self.live += 1
+        # Start the walker first: it resets `position`, which _insert buckets against
+        self._ensure_running()
+        self._insert(timer)
+        return timer
+
+    def debounce(self, key, delay, callback):
+        """(Re)arm the timer for `key` to fire `delay` seconds from now with the latest callback."""
+        timer = self.keyed.get(key)
+        if timer is None or timer.done():
+            return self.call_later(delay, callback, key)
+        timer.deadline = time.monotonic() + delay
+        timer.callback = callback
+        return timer
+
+    def cancel(self, key):
+        timer = self.keyed.get(key)
+        if timer is not None:
+            timer.cancel()
+
+    def stats(self) -> dict:
+        return {"live_timers": self.live, "keyed_timers": len(self.keyed)}
+
+    # ==================== INTERNALS ====================
+
+    def _tick_of(self, moment):
+        return int((moment - self.origin) / self.tick)
+
+    def _insert(self, timer):
+        tick = max(self._tick_of(timer.deadline), self.position + 1)
+        self.slots[tick % len(self.slots)].append(timer)
+
+    def _forget(self, timer):
+        self.live -= 1
+        if timer.key is not None and self.keyed.get(timer.key) is timer:
+            del self.keyed[timer.key]
+
+    def _ensure_running(self):
+        if self.task is None or self.task.done():
+            self.position = self._tick_of(time.monotonic())
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while self.live > 0:
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+            target = self._tick_of(now)
+            # Never walk more than one full turn; everything due is in there.
+            start = max(self.position + 1, target - len(self.slots) + 1)
+            for tick in range(start, target + 1):
+                self.position = tick
+                index = tick % len(self.slots)
+                bucket, self.slots[index] = self.slots[index], []
+                for timer in bucket:
+                    if timer.cancelled:
+                        continue
+                    if timer.deadline > now:
+                        self._insert(timer)
+                    else:
+                        self._fire(timer)
+            self.position = target
+
+    def _fire(self, timer):
+        timer.fired = True
+        self._forget(timer)
+        try:
+            result = timer.callback()
+            if asyncio.iscoroutine(result):
+                asyncio.create_task(self._guard(result))
+        except Exception as e:
+            logger.error(f"Error in timer callback: {e}")
+
+    @staticmethod
+    async def _guard(coro):
+        try:
+            await coro
+        except Exception as e:
+            logger.error(f"Error in timer callback: {e}")
+
+
+timer_wheel = TimerWheel()
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+
+from config import *
+
+logger = logging.getLogger(__name__)
+
+current = ContextVar("trace", default=None)
+
+
+class Trace:
+    """Spans recorded while one update was handled."""
+
+    __slots__ = ('handler', 'user_id', 'wall', 'start', 'duration', 'spans', 'finished')
+
+    def __init__(self, handler, user_id):
+        self.handler = handler
+        self.user_id = user_id
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.spans = []      # (name, offset, duration) in seconds
+        self.finished = False
+
+    def breakdown(self):
+        """{span name: (count, total seconds)}, slowest first."""
+        totals = {}
+        for name, _, duration in self.spans:
+            if name == self.handler:
+                continue  # the handler's own span is the whole trace
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + duration)
+        return dict(sorted(totals.items(), key=lambda item: -item[1][1]))
+
+    def to_dict(self) -> dict:
+        return {
+            "handler": self.handler,
+            "user_id": self.user_id,
+            "ts": self.wall,
+            "duration_ms": round(self.duration * 1000, 3),
+            "spans": [
+                {"name": name, "offset_ms": round(offset * 1000, 3), "duration_ms": round(duration * 1000, 3)}
+                for name, offset, duration in self.spans
+            ],
+        }
+
+
+class Tracer:
+    """
+    Samples incoming updates and records where their time goes.
+
+    A sampled update gets a Trace in a context variable; handlers, Master
+    calls and Telegram RPCs made while handling it add spans to it. Nothing
+    is recorded for unsampled updates beyond one ContextVar lookup. Finished
+    traces are kept for /traces and, if TRACE_FILE is set, appended to it in
+    batches from a worker thread so the event loop never waits on the disk.
+    """
+
+    FLUSH_LINES = 50
+    FLUSH_INTERVAL = 5
+
+    def __init__(self, sample_rate=TRACE_SAMPLE_RATE, path=TRACE_FILE, keep=TRACE_KEEP):
+        self.sample_rate = sample_rate
+        self.path = path
+        self.recent = deque(maxlen=keep)
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def begin(self, handler, user_id):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        trace = Trace(handler, user_id)
+        return trace, current.set(trace)
+
+    def end(self, token):
+        trace, reset = token
+        trace.duration = time.perf_counter() - trace.start
+        trace.finished = True
+        current.reset(reset)
+        self.recent.append(trace)
+        if self.path:
+            self.buffer.append(trace.to_dict())
+            if len(self.buffer) >= self.FLUSH_LINES or time.monotonic() - self.last_flush >= self.FLUSH_INTERVAL:
+                self.last_flush = time.monotonic()
+                asyncio.create_task(self.flush())
+
+    async def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        lines, self.buffer = self.buffer, []
+        text = "".join(json.dumps(line) + "\n" for line in lines)
+        async with self.lock:   # one append at a time, in order
+            try:
+                await asyncio.to_thread(self._append, text)
+            except Exception as e:
+                logger.error(f"Error writing traces: {e}")
+
+    def _append(self, text):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(text)
+
+    def slowest(self, count=5):
+        return sorted(self.recent, key=lambda trace: -trace.duration)[:count]
+
+
+tracer = Tracer()
+
+
+def record(name, start, duration):
+    """Add a span to the update being handled, if it is sampled."""
+    trace = current.get()
+    if trace is not None and not trace.finished:
+        trace.spans.append((name, start - trace.start, duration))
+
+
+class span:
+    """`with span("sort"):` — time a block as part of the current trace."""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, time.perf_counter() - self.start)
+
+
+def traced_handler(func):
+    """Start a (sampled) trace for each update `func` handles."""
+    @wraps(func)
+    async def wrapper(client, update, *args, **kwargs):
+        user = getattr(update, "from_user", None)
+        token = tracer.begin(func.__name__, user.id if user else None)
+        try:
+            return await func(client, update, *args, **kwargs)
+        finally:
+            if token is not None:
+                tracer.end(token)
+    return wrapper
@@ -0,0 +1,230 @@
+"""
+Benchmark suite for the sequencing core, with JSON output for comparing commits.
+
+Covers extract_file_info (cold and warm parser cache), parse_and_sort_files
+in every mode, and collect_files ingest per message against stub Message
+objects (the ban/fsub decorators are skipped; they are cache lookups and
+have their own metrics). Database writes are replaced by no-ops so the
+numbers are pure CPU.
+
+Usage:
+    python benchmarks/bench_core.py [--files 10000] [--sizes 1000 10000 50000]
+                                    [--repeat 5] [--output results.json]
+                                    [--compare baseline.json] [--threshold 0.15]
+
+With --compare, every case more than `threshold` slower than the baseline is
+listed and the exit status is 1, so the run can gate a deploy.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# config.py requires these at import time
+for key, value in {"APP_ID": "0", "OWNER_ID": "0", "DATABASE_CHANNEL": "0",
+                   "DB_URI": "mongodb://localhost:27017", "DB_NAME": "bench"}.items():
+    os.environ.setdefault(key, value)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpus import make_filenames, make_file_data
+from fakes import ErrorCounter
+from Database.database import Seishiro
+from Plugins import Sequence
+from Plugins.Sequence import (
+    SequenceIndex, collect_files, extract_file_info, file_parser, parse_and_sort_files, user_sessions,
+)
+from Plugins.callbacks import MODE_ORDER
+from Plugins.sessions import session_store
+from Plugins.timers import timer_wheel
+
+
+def best_of(func, repeat, setup=None):
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def result(seconds, count, unit):
+    return {"count": count, "total_ms": round(seconds * 1000, 3), f"us_per_{unit}": round(seconds / count * 1e6, 3)}
+
+
+# ==================== CASES ====================
+
+def bench_extract(files, repeat):
+    names = make_filenames(files)
+
+    def run():
+        for name in names:
+            extract_file_info(name, 'document')
+
+    return {
+        "extract_file_info.cold": result(best_of(run, repeat, setup=file_parser.cache_clear), files, "file"),
+        "extract_file_info.warm": result(best_of(run, repeat), files, "file"),
+    }
+
+
+def bench_sort(sizes, repeat):
+    results = {}
+    for size in sizes:
+        data = make_file_data(size)
+        file_parser.cache_clear()
+        for mode in MODE_ORDER:
+            seconds = best_of(lambda: parse_and_sort_files(data, mode), repeat)
+            results[f"parse_and_sort_files.{mode}.{size}"] = result(seconds, size, "file")
+    return results
+
+
+class StubMessage:
+    """Just the Message surface collect_files reads."""
+
+    def __init__(self, msg_id, user_id, document=None, text=None):
+        self.id = msg_id
+        self.from_user = SimpleNamespace(id=user_id)
+        self.document = document
+        self.video = None
+        self.audio = None
+        self.text = text
+        self.caption = None
+
+    async def reply_text(self, *args, **kwargs):
+        return self
+
+
+def document_messages(user_id, count):
+    return [
+        StubMessage(i, user_id, document=SimpleNamespace(
+            file_name=name, file_id=f"BQAD{i:08d}", file_unique_id=f"AgAD{i:08d}"
+        ))
+        for i, name in enumerate(make_filenames(count, seed=user_id))
+    ]
+
+
+def text_messages(user_id, count, lines):
+    names = make_filenames(count * lines, seed=user_id)
+    return [StubMessage(i, user_id, text="\n".join(names[i * lines:(i + 1) * lines])) for i in range(count)]
+
+
+async def bench_collect(files, repeat):
+    handler = inspect.unwrap(collect_files)   # skip check_ban / check_fsub
+
+    async def no_write(changes):
+        return set()
+    Seishiro.save_sequence_sessions = no_write
+    session_store.max_pending = float("inf")
+
+    results = {}
+    cases = [
+        ("document", lambda: document_messages(1, files), files),
+        ("text20", lambda: text_messages(2, max(1, files // 20), 20), max(1, files // 20) * 20),
+    ]
+    for label, build, file_count in cases:
+        messages = build()
+        user_id = messages[0].from_user.id
+        best = float("inf")
+        # collect_files logs and swallows its errors; timing that path is meaningless
+        errors = ErrorCounter()
+        logging.getLogger().addHandler(errors)
+        for _ in range(repeat):
+            user_sessions[user_id] = {'files': SequenceIndex('All')}
+            file_parser.cache_clear()
+            start = time.perf_counter()
+            for message in messages:
+                await handler(None, message)
+            best = min(best, time.perf_counter() - start)
+            timer_wheel.cancel(('notify', user_id))
+        logging.getLogger().removeHandler(errors)
+        if errors.counts:
+            sys.exit(f"collect_files.{label}: {sum(errors.counts.values())} error(s) logged, "
+                     f"first: {errors.samples[0]}")
+        results[f"collect_files.{label}"] = {
+            **result(best, len(messages), "message"),
+            "us_per_file": round(best / file_count * 1e6, 3),
+        }
+        user_sessions.pop(user_id, None)
+        Sequence.pending_notifications.pop(user_id, None)
+    session_store.pending.clear()
+    return results
+
+
+# ==================== REPORTING ====================
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Cases slower than baseline by more than `threshold` (as a fraction)."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        if before["total_ms"] > 0 and current["total_ms"] > before["total_ms"] * (1 + threshold):
+            regressions.append((name, before["total_ms"], current["total_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    results = {}
+    results.update(bench_extract(args.files, args.repeat))
+    results.update(bench_sort(args.sizes, args.repeat))
+    results.update(asyncio.run(bench_collect(args.files, args.repeat)))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "files": args.files,
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.2f} ms -> {after:.2f} ms (+{(after / before - 1) * 100:.0f}%)",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
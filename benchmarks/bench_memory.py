@@ -0,0 +1,84 @@
+"""
+Memory benchmark: bytes per queued file for the old dict-based session
+entries vs. FileEntry records.
+
+"before" is what a session held per file up to now: the raw
+{'filename', 'format', 'file_id', 'message_id'} dict collected on ingest
+plus the parsed dict built from it. "after" is one FileEntry.
+Filenames and file_ids are allocated up front and excluded, since both
+layouts have to keep them.
+
+Usage:
+    python benchmarks/bench_memory.py [--files 10000]
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+# config.py requires these at import time
+for key, value in {"APP_ID": "0", "OWNER_ID": "0", "DATABASE_CHANNEL": "0",
+                   "DB_URI": "mongodb://localhost:27017", "DB_NAME": "bench"}.items():
+    os.environ.setdefault(key, value)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import make_filenames
+from Plugins.Sequence import extract_file_info, file_parser, QUALITY_ORDER
+
+
+def legacy_entries(corpus, file_ids):
+    raw, parsed = [], []
+    for i, name in enumerate(corpus):
+        item = {'filename': name, 'format': 'document', 'file_id': file_ids[i], 'message_id': i + 1000}
+        season, episode, quality = file_parser.parse(name)
+        raw.append(item)
+        parsed.append({
+            'filename': name,
+            'format': 'document',
+            'file_id': file_ids[i],
+            'message_id': i + 1000,
+            'season': season,
+            'episode': episode,
+            'quality': quality,
+            'quality_order': QUALITY_ORDER.get(quality, 7),
+            'is_series': bool(season or episode)
+        })
+    return raw, parsed
+
+
+def slotted_entries(corpus, file_ids):
+    return [extract_file_info(name, 'document', file_ids[i], i + 1000) for i, name in enumerate(corpus)]
+
+
+def measure(build, corpus, file_ids):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build(corpus, file_ids)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=10000)
+    args = parser.parse_args()
+
+    corpus = make_filenames(args.files)
+    file_ids = [f"BQACAgUAAxkBAAI{i:012d}" for i in range(args.files)]
+    for name in corpus:  # warm the parser cache so it isn't counted
+        file_parser.parse(name)
+
+    legacy = measure(legacy_entries, corpus, file_ids)
+    slotted = measure(slotted_entries, corpus, file_ids)
+
+    print(f"files: {args.files}")
+    print(f"raw + parsed dicts : {legacy / args.files:8.1f} bytes/file")
+    print(f"FileEntry          : {slotted / args.files:8.1f} bytes/file")
+    print(f"saved              : {(1 - slotted / legacy) * 100:7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: FileInfoParser vs. the original uncompiled extract_file_info.
+
+Usage:
+    python benchmarks/bench_parser.py [--files 5000] [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+# config.py requires these at import time
+for key, value in {"APP_ID": "0", "OWNER_ID": "0", "DATABASE_CHANNEL": "0",
+                   "DB_URI": "mongodb://localhost:27017", "DB_NAME": "bench"}.items():
+    os.environ.setdefault(key, value)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import make_filenames
+from config import SEASON_PATTERN, EPISODE_PATTERN, QUALITY_PATTERN, QUALITY_ORDER
+from Plugins.Sequence import FileInfoParser, extract_file_info, file_parser
+
+
+def legacy_extract_file_info(filename, file_format, file_id=None, message_id=None):
+    quality_match = re.search(QUALITY_PATTERN, filename, re.IGNORECASE)
+    quality = quality_match.group(1).lower() if quality_match else 'unknown'
+
+    temp = re.sub(QUALITY_PATTERN, '', filename, flags=re.IGNORECASE) if quality_match else filename
+
+    season_match = re.search(SEASON_PATTERN, temp)
+    season = int(season_match.group(1)) if season_match else 0
+
+    episode_match = re.search(EPISODE_PATTERN, temp)
+    episode = int(episode_match.group(1)) if episode_match else 0
+    if not episode_match:
+        nums = re.findall(r'\d{1,3}', temp)
+        episode = int(nums[-1]) if nums else 0
+
+    return {
+        'filename': filename,
+        'format': file_format,
+        'file_id': file_id,
+        'message_id': message_id,
+        'season': season,
+        'episode': episode,
+        'quality': quality,
+        'quality_order': QUALITY_ORDER.get(quality, 7),
+        'is_series': bool(season or episode)
+    }
+
+
+def timed(func, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name in corpus:
+            func(name, "document")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = make_filenames(args.files)
+
+    mismatches = [n for n in corpus
+                  if legacy_extract_file_info(n, "document") != extract_file_info(n, "document").as_dict()]
+    if mismatches:
+        print(f"!! {len(mismatches)} results differ from legacy, e.g. {mismatches[0]!r}")
+
+    legacy = timed(legacy_extract_file_info, corpus, args.repeat)
+
+    cold_parser = FileInfoParser(maxsize=0)
+    cold = timed(lambda name, fmt: cold_parser.parse(name), corpus, args.repeat)
+
+    file_parser.cache_clear()
+    timed(extract_file_info, corpus, 1)
+    warm = timed(extract_file_info, corpus, args.repeat)
+
+    print(f"files: {args.files}, best of {args.repeat}")
+    print(f"legacy extract_file_info : {legacy * 1000:8.2f} ms  ({legacy / args.files * 1e6:.2f} µs/file)")
+    print(f"compiled, uncached       : {cold * 1000:8.2f} ms  ({cold / args.files * 1e6:.2f} µs/file)")
+    print(f"compiled, warm LRU       : {warm * 1000:8.2f} ms  ({warm / args.files * 1e6:.2f} µs/file)")
+    print(f"cache: {file_parser.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
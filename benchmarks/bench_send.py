@@ -0,0 +1,190 @@
+"""
+End-to-end send throughput for /esequence and /broadcast, fully offline.
+
+Runs the real handlers (ban/fsub checks, send scheduler, Master) against
+FakeClient and in-memory collections on a virtual clock, so a run paced
+by rate limits and FloodWaits takes seconds of CPU while reporting the
+wire time it would have taken. The bot side is tuned the usual way, with
+SEND_* and BROADCAST_* environment variables; the flags below tune the
+simulated Telegram.
+
+Usage:
+    python benchmarks/bench_send.py [--files 500] [--missing-share 0.01]
+                                    [--users 5000] [--blocked-share 0.05]
+                                    [--latency 0.05] [--jitter 0.02]
+                                    [--flood-private-rate 1] [--flood-channel-rate 0.33]
+                                    [--flood-global-rate 30] [--flood-burst 3] [--flood-penalty 2]
+                                    [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+# config.py requires these at import time
+for key, value in {"APP_ID": "0", "OWNER_ID": "7", "DATABASE_CHANNEL": "0",
+                   "DB_URI": "mongodb://localhost:27017", "DB_NAME": "bench"}.items():
+    os.environ.setdefault(key, value)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpus import make_file_data
+from fakes import FakeClient, FloodModel, fake_media, run_virtual, use_memory_db
+from config import OWNER_ID
+from Database.database import Seishiro
+from Plugins.bans import ban_list
+from Plugins.broadcast import jobs
+from Plugins.callbacks import DELIVERY_MODES
+from Plugins.cmds import broadcast_handler
+from Plugins.membership import membership
+from Plugins.scheduler import send_scheduler
+from Plugins.Sequence import SequenceIndex, end_cmd, extract_file_info, user_sessions
+
+DUMP_CHANNEL = -1001234567890
+
+
+def reset(args, **client_options):
+    """Fresh DB, scheduler and fake Telegram for one scenario."""
+    collections = use_memory_db(Seishiro)
+    for task in (send_scheduler.task, send_scheduler.flush_task):
+        if task is not None:
+            task.cancel()
+    send_scheduler.__init__()
+    ban_list.banned = {}
+    membership.clear()
+    flood = FloodModel(args.flood_private_rate, args.flood_channel_rate, args.flood_global_rate,
+                       args.flood_burst, args.flood_penalty)
+    client = FakeClient(latency=args.latency, jitter=args.jitter, flood=flood, **client_options)
+    return client, collections
+
+
+def measure(client, loop_start, cpu_start, count, unit):
+    wire = asyncio.get_running_loop().time() - loop_start
+    stats = send_scheduler.stats()
+    return {
+        "count": count,
+        "wire_seconds": round(wire, 3),
+        f"{unit}_per_second": round(count / wire, 3) if wire else None,
+        "cpu_seconds": round(time.process_time() - cpu_start, 3),
+        "rpc_calls": sum(client.calls.values()),
+        "floodwaits": client.flood.raised,
+        "floodwait_seconds": client.flood.told_to_wait,
+        "scheduler_avg_wait": round(stats["avg_wait"], 3),
+        "scheduler_max_wait": round(stats["max_wait"], 3),
+    }
+
+
+async def bench_esequence(args, delivery, dump):
+    # Every n-th source message is gone by the time copy mode forwards it
+    step = round(1 / args.missing_share) if args.missing_share > 0 else 0
+    missing = set(range(step, args.files + 1, step)) if step else set()
+    client, _ = reset(args, missing=missing)
+    user_id = 1000
+    await Seishiro.set_delivery_mode(user_id, delivery)
+    if dump:
+        await Seishiro.set_dump_channel(user_id, DUMP_CHANNEL)
+
+    files = SequenceIndex('All')
+    for item in make_file_data(args.files):
+        media = fake_media(item['file_id'], file_name=item['filename'])
+        client.sources[(user_id, item['message_id'])] = media
+        files.add(extract_file_info(item['filename'], item['format'], item['file_id'], item['message_id'],
+                                    media.file_unique_id))
+    user_sessions[user_id] = {'files': files}
+
+    loop_start, cpu_start = asyncio.get_running_loop().time(), time.process_time()
+    await end_cmd(client, client.message(user_id, text="/esequence"))
+    result = measure(client, loop_start, cpu_start, args.files, "files")
+    result["missing_sources"] = len(missing)
+    result["delivered"] = client.delivered[DUMP_CHANNEL if dump else user_id]
+    return result
+
+
+async def bench_broadcast(args):
+    blocked = set(range(args.users - int(args.users * args.blocked_share) + 1, args.users + 1))
+    client, collections = reset(args, blocked=blocked)
+    users = collections["user_data"]
+    for user_id in range(1, args.users + 1):
+        users.docs[user_id] = Seishiro.new_user(user_id)
+
+    admin = client.message(OWNER_ID, text="/broadcast", reply_to_message=client.message(OWNER_ID, text="hello"))
+    loop_start, cpu_start = asyncio.get_running_loop().time(), time.process_time()
+    before = set(jobs)
+    await broadcast_handler(client, admin)
+    started = set(jobs) - before
+    if not started:
+        raise RuntimeError("broadcast_handler did not start a job (run with --verbose)")
+    job = jobs[started.pop()]
+    await job.task
+
+    result = measure(client, loop_start, cpu_start, args.users, "users")
+    result.update(status=job.status, success=job.success, failed=job.failed, removed=job.removed)
+    return result
+
+
+async def run_all(args):
+    results = {}
+    for delivery in DELIVERY_MODES:
+        for dump in (False, True):
+            name = f"esequence.{delivery}.{'dump' if dump else 'private'}"
+            results[name] = await bench_esequence(args, delivery, dump)
+    results["broadcast"] = await bench_broadcast(args)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--missing-share", type=float, default=0.01,
+                        help="share of source messages deleted before copy mode forwards them")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--blocked-share", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--flood-private-rate", type=float, default=1.0)
+    parser.add_argument("--flood-channel-rate", type=float, default=20 / 60)
+    parser.add_argument("--flood-global-rate", type=float, default=30.0)
+    parser.add_argument("--flood-burst", type=int, default=3)
+    parser.add_argument("--flood-penalty", type=float, default=2.0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own logging")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.CRITICAL)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "args": vars(args),
+            "send": {key: os.environ.get(key) for key in (
+                "SEND_GLOBAL_RATE", "SEND_PRIVATE_RATE", "SEND_CHANNEL_RATE", "SEND_CHAT_BURST",
+                "BROADCAST_WORKERS") if os.environ.get(key)},
+        },
+        "results": run_virtual(run_all(args)),
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Realistic filename corpora for the benchmarks.
+
+Mixes the shapes users actually upload: fansub anime releases with
+S/E tags, TV scene names, "Season X Episode Y" spellings, bare episode
+numbers, movies and extras with no tags at all, quality tags in every
+position, and non-ASCII titles and decorations.
+"""
+import random
+
+SHOWS = [
+    "One Piece", "Naruto Shippuden", "Attack on Titan", "Jujutsu Kaisen", "Frieren",
+    "Breaking Bad", "The Office", "Dark", "Money Heist", "Stranger Things",
+    "葬送のフリーレン", "진격의 거인", "Kimetsu no Yaiba", "Re:Zero", "Ōkami Kakushi",
+]
+GROUPS = ["SubsPlease", "Erai-raws", "HorribleSubs", "Judas", "@RexBots", "Anime Time"]
+QUALITIES = ["480p", "720p", "1080p", "HDRip", "2k", "4k", "2160p", "1440p", ""]
+NOISE = ["", " 🔥", " [Dual Audio]", " ★", " (Hindi Dub)", " ᴴᴰ", " [x265]", " 【高画質】"]
+EXTS = [".mkv", ".mp4", ".avi"]
+
+SERIES_TEMPLATES = [
+    "[{group}] {show} S{s:02d}E{e:02d} [{q}]{noise}{ext}",
+    "{show}.S{s:02d}E{e:02d}.{q}.WEB-DL{ext}",
+    "{show} - EP{e:03d} {q}{noise}{ext}",
+    "{show} Season {s} Episode {e} {q}{ext}",
+    "{show} - {e:02d} [{q}]{noise}{ext}",
+    "[{group}] {show} - {e} ({q}){ext}",
+    "{show}.s{s}e{e}.{q}{ext}",
+    "@{group} {show} S{s} EP {e} {q}{noise}{ext}",
+]
+OTHER_TEMPLATES = [
+    "{show} Movie [{q}]{noise}{ext}",
+    "{show} OST Collection{ext}",
+    "{show} - Opening Theme{noise}{ext}",
+    "Extras - Behind the Scenes{ext}",
+]
+
+
+def make_filenames(count, seed=42, series_share=0.9):
+    """`count` filenames; about `series_share` of them carry season/episode info."""
+    rng = random.Random(seed)
+    names = []
+    for _ in range(count):
+        templates = SERIES_TEMPLATES if rng.random() < series_share else OTHER_TEMPLATES
+        names.append(rng.choice(templates).format(
+            show=rng.choice(SHOWS), group=rng.choice(GROUPS),
+            s=rng.randint(1, 12), e=rng.randint(1, 400),
+            q=rng.choice(QUALITIES), noise=rng.choice(NOISE), ext=rng.choice(EXTS),
+        ))
+    return names
+
+
+def make_file_data(count, seed=42):
+    """Raw session items as parse_and_sort_files takes them."""
+    return [
+        {'filename': name, 'format': 'document', 'file_id': f"BQAD{i:08d}", 'message_id': i + 1}
+        for i, name in enumerate(make_filenames(count, seed))
+    ]
@@ -0,0 +1,624 @@
+"""
+Offline stand-ins for Telegram and Mongo, for end-to-end throughput runs.
+
+FakeClient implements the pyrogram Client surface the plugins call, with
+configurable latency and a Telegram-like flood model that raises
+FloodWait. MemoryCollection replaces Master's motor collections so the
+real Master code runs against dicts. VirtualTimeLoop is an event loop
+whose clock jumps to the next timer whenever nothing is ready, so a run
+that is paced by rate limits and FloodWait sleeps finishes in CPU time
+while reporting what it would have taken on the wire.
+
+Import it after the config environment and sys.path are set up, as
+bench_send.py does.
+"""
+import asyncio
+import copy
+import itertools
+import logging
+import math
+import random
+import selectors
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pyrogram import Client
+from pyrogram.enums import ChatMemberStatus, ChatType, ListenerTypes
+from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, UserNotParticipant
+
+from Plugins.scheduler import TokenBucket
+
+
+# ==================== VIRTUAL TIME ====================
+
+class _VirtualSelector:
+    """Selector that advances the clock instead of sleeping when there is no I/O."""
+
+    # Every loop iteration costs at least this much, as it would on a real
+    # clock; otherwise a timer "1e-14 s from now" (float rounding in a token
+    # bucket) fires within the clock resolution forever without time passing.
+    MIN_STEP = 1e-6
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.real = selectors.DefaultSelector()
+
+    def select(self, timeout=None):
+        events = self.real.select(0)
+        if events:
+            return events
+        if timeout is None:
+            return self.real.select(None)  # nothing scheduled: only another thread can wake us
+        self.loop.now += max(timeout, self.MIN_STEP)
+        return []
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop on simulated time. The clock starts at the real monotonic
+    time (singletons created at import read it) and only moves when every
+    task is waiting on a timer.
+    """
+
+    def __init__(self):
+        self.now = time.monotonic()
+        super().__init__(_VirtualSelector(self))
+
+    def time(self):
+        return self.now
+
+
+def run_virtual(coro):
+    """Run `coro` on a VirtualTimeLoop, with time.monotonic() following the virtual clock."""
+    loop = VirtualTimeLoop()
+    real_monotonic = time.monotonic
+    time.monotonic = loop.time
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        # Background loops (scheduler, session flush, timers) never end on their own
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        time.monotonic = real_monotonic
+        loop.close()
+
+
+# ==================== TELEGRAM ====================
+
+class FloodModel:
+    """
+    Telegram-like send limits: a token bucket per chat (about 1 msg/s in
+    private chats, 20/min in groups and channels, small bursts allowed)
+    and one for the whole bot (about 30 msg/s).
+
+    A request that finds its bucket empty gets FloodWait for the time the
+    bucket needs plus `penalty` seconds, and the chat (or the whole bot)
+    stays blocked until then; requests sent meanwhile get the remaining
+    wait, like the real server.
+    """
+
+    def __init__(self, private_rate=1.0, channel_rate=20 / 60, global_rate=30.0, burst=3, penalty=2.0):
+        self.private_rate = private_rate
+        self.channel_rate = channel_rate
+        self.global_rate = global_rate
+        self.burst = burst
+        self.penalty = penalty
+        self.global_bucket = None
+        self.chats = {}            # chat_id → TokenBucket
+        self.blocked_until = {}    # chat_id (None = whole bot) → time
+        self.raised = 0
+        self.told_to_wait = 0
+
+    def check(self, chat_id, now):
+        if self.global_bucket is None:
+            self.global_bucket = TokenBucket(self.global_rate, self.global_rate)
+            self.global_bucket.updated = now
+        for key in (None, chat_id):
+            until = self.blocked_until.get(key, 0)
+            if now < until:
+                self._raise(math.ceil(until - now))
+
+        bucket = self.chats.get(chat_id)
+        if bucket is None:
+            rate = self.private_rate if chat_id > 0 else self.channel_rate
+            bucket = self.chats[chat_id] = TokenBucket(rate, self.burst)
+            bucket.updated = now
+
+        for key, limiter in ((None, self.global_bucket), (chat_id, bucket)):
+            delay = limiter.delay(now)
+            if delay > 0:
+                wait = math.ceil(delay + self.penalty)
+                self.blocked_until[key] = now + wait
+                self._raise(wait)
+        self.global_bucket.take(now)
+        bucket.take(now)
+
+    def _raise(self, seconds):
+        self.raised += 1
+        self.told_to_wait += seconds
+        raise FloodWait(value=seconds)
+
+
+class FakeChat(SimpleNamespace):
+    pass
+
+
+class FakeUser(SimpleNamespace):
+    pass
+
+
+class FakeMessage:
+    """The parts of pyrogram.types.Message the plugins read or call."""
+
+    def __init__(self, client, chat_id, msg_id, user_id=None, text=None, document=None,
+                 video=None, audio=None, reply_to_message=None):
+        self._client = client
+        self.id = msg_id
+        self.chat = FakeChat(id=chat_id, type=ChatType.PRIVATE if chat_id > 0 else ChatType.CHANNEL, username=None)
+        self.from_user = make_user(user_id) if user_id is not None else None
+        self.text = text
+        self.caption = None
+        self.document = document
+        self.video = video
+        self.audio = audio
+        self.reply_to_message = reply_to_message
+
+    def __getattr__(self, name):
+        # Fields nobody set read as None, as on pyrogram's Message
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return None
+
+    async def reply_text(self, text, *args, **kwargs):
+        return await self._client.send_message(self.chat.id, text)
+
+    async def reply(self, text, *args, **kwargs):
+        return await self.reply_text(text)
+
+    async def edit_text(self, text, *args, **kwargs):
+        return await self._client.edit_message_text(self.chat.id, self.id, text)
+
+    async def edit(self, text, *args, **kwargs):
+        return await self.edit_text(text)
+
+    async def delete(self, *args, **kwargs):
+        return await self._client._call("delete_messages", self.chat.id, flood=False)
+
+    async def copy(self, chat_id, *args, **kwargs):
+        return await self._client._call("copy_message", chat_id, count=1)
+
+
+def fake_media(file_id, **fields):
+    """A document/video/audio object; the fake's file_unique_id is always "U" + file_id."""
+    return SimpleNamespace(file_id=file_id, file_unique_id=f"U{file_id}", **fields)
+
+
+def make_user(user_id):
+    return FakeUser(id=user_id, first_name=f"User{user_id}", last_name=None, username=f"user{user_id}",
+                    usernames=None, mention=f"[User{user_id}](tg://user?id={user_id})", is_bot=False)
+
+
+class FakeClient:
+    """
+    In-process stand-in for pyrogram.Client.
+
+    Every call sleeps `latency` ± `jitter` seconds, then (for sends) asks
+    the flood model, if any, for a slot. `blocked` and `deactivated` user ids fail
+    the way Telegram fails them; users not in `members[channel_id]` get
+    UserNotParticipant from get_chat_member (all users are members of
+    channels not listed). forward_messages looks its sources up in
+    `sources[(chat_id, message_id)]` and skips the ids in `missing`, as
+    Telegram skips deleted messages. `calls` and `floodwaits` count per
+    method.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.02, flood=None, blocked=(), deactivated=(), members=None,
+                 missing=(), seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood = flood
+        self.blocked = set(blocked)
+        self.deactivated = set(deactivated)
+        self.members = members or {}
+        self.missing = set(missing)
+        self.sources = {}            # (chat_id, message_id) → media of a message that can be forwarded
+        self.rng = random.Random(seed)
+        self.ids = itertools.count(1)
+        self.me = make_user(1)
+        self.me.is_bot = True
+        self.calls = Counter()
+        self.floodwaits = Counter()
+        self.delivered = Counter()   # chat_id → media items that arrived (texts and edits not counted)
+        self.listeners = {listener_type: [] for listener_type in ListenerTypes}   # pyromod, read by handler.check
+
+    async def _call(self, method, chat_id, flood=True, count=0):
+        self.calls[method] += 1
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        await asyncio.sleep(max(0.0, delay))
+        if chat_id in self.blocked:
+            raise UserIsBlocked()
+        if chat_id in self.deactivated:
+            raise InputUserDeactivated()
+        if flood and self.flood is not None:
+            try:
+                self.flood.check(chat_id, asyncio.get_running_loop().time())
+            except FloodWait:
+                self.floodwaits[method] += 1
+                raise
+        self.delivered[chat_id] += count
+        return FakeMessage(self, chat_id, next(self.ids))
+
+    # ==================== SENDING ====================
+
+    async def send_message(self, chat_id, text, *args, **kwargs):
+        message = await self._call("send_message", chat_id)
+        message.text = text
+        return message
+
+    async def send_document(self, chat_id, document, *args, **kwargs):
+        message = await self._call("send_document", chat_id, count=1)
+        message.document = fake_media(document)
+        return message
+
+    async def send_video(self, chat_id, video, *args, **kwargs):
+        message = await self._call("send_video", chat_id, count=1)
+        message.video = fake_media(video)
+        return message
+
+    async def send_audio(self, chat_id, audio, *args, **kwargs):
+        message = await self._call("send_audio", chat_id, count=1)
+        message.audio = fake_media(audio)
+        return message
+
+    async def send_media_group(self, chat_id, media, *args, **kwargs):
+        first = await self._call("send_media_group", chat_id, count=len(media))
+        sent = [first] + [FakeMessage(self, chat_id, next(self.ids)) for _ in media[1:]]
+        for message, item in zip(sent, media):
+            message.document = fake_media(item.media)
+        return sent
+
+    async def forward_messages(self, chat_id, from_chat_id, message_ids, *args, **kwargs):
+        ids = message_ids if isinstance(message_ids, list) else [message_ids]
+        found = [i for i in ids if i not in self.missing]
+        if not found:
+            await self._call("forward_messages", chat_id)
+            return []
+        first = await self._call("forward_messages", chat_id, count=len(found))
+        sent = [first] + [FakeMessage(self, chat_id, next(self.ids)) for _ in found[1:]]
+        for message, source_id in zip(sent, found):
+            message.document = self.sources.get((from_chat_id, source_id))
+        return sent
+
+    async def copy_message(self, chat_id, from_chat_id, message_id, *args, **kwargs):
+        return await self._call("copy_message", chat_id, count=1)
+
+    async def edit_message_text(self, chat_id, message_id, text, *args, **kwargs):
+        message = await self._call("edit_message_text", chat_id)
+        message.id, message.text = message_id, text
+        return message
+
+    # ==================== LISTENERS ====================
+
+    # pyrofork's handlers look for a waiting listen() before running; the
+    # real lookup works on `listeners` as is.
+    get_listener_matching_with_data = Client.get_listener_matching_with_data
+    remove_listener = Client.remove_listener
+
+    # ==================== LOOKUPS ====================
+
+    async def get_me(self):
+        return self.me
+
+    async def get_messages(self, chat_id, message_ids, *args, **kwargs):
+        await self._call("get_messages", chat_id, flood=False)
+        if isinstance(message_ids, list):
+            return [FakeMessage(self, chat_id, i) for i in message_ids]
+        return FakeMessage(self, chat_id, message_ids)
+
+    async def get_chat(self, chat_id):
+        await self._call("get_chat", chat_id, flood=False)
+        return FakeChat(id=chat_id, title=f"Chat {chat_id}", username=None,
+                        type=ChatType.PRIVATE if chat_id > 0 else ChatType.CHANNEL,
+                        invite_link=f"https://t.me/+chat{abs(chat_id)}")
+
+    async def get_chat_member(self, chat_id, user_id):
+        await self._call("get_chat_member", chat_id, flood=False)
+        members = self.members.get(chat_id)
+        if members is not None and user_id not in members:
+            raise UserNotParticipant()
+        return SimpleNamespace(status=ChatMemberStatus.MEMBER, user=make_user(user_id))
+
+    async def create_chat_invite_link(self, chat_id, *args, **kwargs):
+        await self._call("create_chat_invite_link", chat_id, flood=False)
+        return SimpleNamespace(invite_link=f"https://t.me/+fake{next(self.ids)}", **kwargs)
+
+    # ==================== HELPERS ====================
+
+    def message(self, user_id, msg_id=None, **fields):
+        """An incoming private message from `user_id`; its media can be forwarded later."""
+        message = FakeMessage(self, user_id, msg_id or next(self.ids), user_id=user_id, **fields)
+        media = message.document or message.video or message.audio
+        if media is not None:
+            self.sources[(user_id, message.id)] = media
+        return message
+
+
+# ==================== ERRORS ====================
+
+class ErrorCounter(logging.Handler):
+    """
+    Counts ERROR records by logger name, so a run whose handlers only went
+    through their except blocks fails instead of timing them. install()
+    keeps the records flowing even when console output is turned down.
+    """
+
+    SAMPLES = 5
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.counts = Counter()
+        self.samples = []
+
+    def emit(self, record):
+        self.counts[record.name] += 1
+        if len(self.samples) < self.SAMPLES:
+            self.samples.append(f"{record.name}: {record.getMessage()}")
+
+    def install(self, verbose=False):
+        """Attach to the root logger; the console shows INFO if `verbose`, else nothing."""
+        root = logging.getLogger()
+        for handler in root.handlers:
+            handler.setLevel(logging.INFO if verbose else logging.CRITICAL)
+        root.setLevel(logging.INFO if verbose else logging.ERROR)
+        root.addHandler(self)
+        return self
+
+    def report(self):
+        return {"count": sum(self.counts.values()), "by_logger": dict(self.counts), "first": self.samples}
+
+
+# ==================== MONGO ====================
+
+def _lookup(doc, path):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _matches(doc, query):
+    for path, cond in (query or {}).items():
+        found, value = _lookup(doc, path)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            for op, arg in cond.items():
+                if op == "$exists":
+                    ok = found == bool(arg)
+                elif op == "$in":
+                    ok = found and (value in arg or (isinstance(value, list) and any(v in arg for v in value)))
+                elif op == "$ne":
+                    ok = not found or value != arg
+                elif not found or value is None:
+                    ok = False
+                elif op == "$gt":
+                    ok = value > arg
+                elif op == "$gte":
+                    ok = value >= arg
+                elif op == "$lt":
+                    ok = value < arg
+                elif op == "$lte":
+                    ok = value <= arg
+                else:
+                    raise NotImplementedError(f"query operator {op}")
+                if not ok:
+                    return False
+        elif not found or (value != cond and not (isinstance(value, list) and cond in value)):
+            return False
+    return True
+
+
+def _parent(doc, path):
+    *parents, key = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    return doc, key
+
+
+def _apply(doc, update):
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            parent, key = _parent(doc, path)
+            if op == "$set":
+                parent[key] = copy.deepcopy(arg)
+            elif op == "$unset":
+                parent.pop(key, None)
+            elif op == "$inc":
+                parent[key] = parent.get(key, 0) + arg
+            elif op == "$push":
+                items = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                parent.setdefault(key, []).extend(copy.deepcopy(items))
+            elif op == "$addToSet":
+                values = parent.setdefault(key, [])
+                if arg not in values:
+                    values.append(arg)
+            elif op == "$pull":
+                parent[key] = [v for v in parent.get(key, []) if v != arg]
+            else:
+                raise NotImplementedError(f"update operator {op}")
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    out = {"_id": doc["_id"]} if projection.get("_id", 1) else {}
+    for path, include in projection.items():
+        top = path.split(".")[0]
+        if include and top != "_id" and top in doc:
+            out[top] = copy.deepcopy(doc[top])
+    return out
+
+
+class MemoryCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction=1):
+        self.docs.sort(key=lambda d: (d.get(key) is None, d.get(key)), reverse=direction == -1)
+        return self
+
+    def limit(self, count):
+        if count:
+            self.docs = self.docs[:count]
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs if length is None else self.docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class MemoryCollection:
+    """Dict-backed collection covering the motor calls Master makes."""
+
+    def __init__(self, name="memory"):
+        self.name = name
+        self.docs = {}   # _id → document
+        self.ids = itertools.count(1)
+        self.ops = Counter()
+
+    def _find(self, query):
+        if query and set(query) == {"_id"} and not isinstance(query["_id"], dict):
+            doc = self.docs.get(query["_id"])
+            return [doc] if doc is not None else []
+        return [doc for doc in self.docs.values() if _matches(doc, query)]
+
+    def _upsert(self, query, update=None, replacement=None):
+        doc = {k: copy.deepcopy(v) for k, v in query.items()
+               if "." not in k and not (isinstance(v, dict) and any(op.startswith("$") for op in v))}
+        doc.setdefault("_id", next(self.ids))
+        if replacement is not None:
+            doc = {"_id": doc["_id"], **copy.deepcopy(replacement)}
+        else:
+            _apply(doc, update)
+        self.docs[doc["_id"]] = doc
+        return doc["_id"]
+
+    async def find_one(self, query=None, projection=None):
+        self.ops["find_one"] += 1
+        docs = self._find(query)
+        return _project(docs[0], projection) if docs else None
+
+    def find(self, query=None, projection=None):
+        self.ops["find"] += 1
+        return MemoryCursor([_project(doc, projection) for doc in self._find(query)])
+
+    async def count_documents(self, query):
+        self.ops["count_documents"] += 1
+        return len(self._find(query))
+
+    async def insert_one(self, doc):
+        self.ops["insert_one"] += 1
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", next(self.ids))
+        self.docs[doc["_id"]] = doc
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        self.ops["update_one"] += 1
+        return self._update(query, update, upsert, many=False)
+
+    async def update_many(self, query, update, upsert=False):
+        self.ops["update_many"] += 1
+        return self._update(query, update, upsert, many=True)
+
+    def _update(self, query, update, upsert, many):
+        docs = self._find(query)
+        if not many:
+            docs = docs[:1]
+        for doc in docs:
+            _apply(doc, update)
+        upserted = self._upsert(query, update) if upsert and not docs else None
+        return SimpleNamespace(matched_count=len(docs), modified_count=len(docs), upserted_id=upserted)
+
+    async def replace_one(self, query, replacement, upsert=False):
+        self.ops["replace_one"] += 1
+        return self._replace(query, replacement, upsert)
+
+    def _replace(self, query, replacement, upsert):
+        docs = self._find(query)[:1]
+        for doc in docs:
+            self.docs[doc["_id"]] = {"_id": doc["_id"], **copy.deepcopy(replacement)}
+        upserted = self._upsert(query, replacement=replacement) if upsert and not docs else None
+        return SimpleNamespace(matched_count=len(docs), modified_count=len(docs), upserted_id=upserted)
+
+    async def delete_one(self, query):
+        self.ops["delete_one"] += 1
+        docs = self._find(query)[:1]
+        for doc in docs:
+            del self.docs[doc["_id"]]
+        return SimpleNamespace(deleted_count=len(docs))
+
+    async def delete_many(self, query):
+        self.ops["delete_many"] += 1
+        docs = self._find(query)
+        for doc in docs:
+            del self.docs[doc["_id"]]
+        return SimpleNamespace(deleted_count=len(docs))
+
+    async def bulk_write(self, requests, ordered=True):
+        """pymongo DeleteOne / ReplaceOne / UpdateOne requests."""
+        self.ops["bulk_write"] += 1
+        deleted = modified = upserted = 0
+        for request in requests:
+            kind = type(request).__name__
+            if kind == "DeleteOne":
+                docs = self._find(request._filter)[:1]
+                for doc in docs:
+                    del self.docs[doc["_id"]]
+                deleted += len(docs)
+                continue
+            if kind == "ReplaceOne":
+                result = self._replace(request._filter, request._doc, request._upsert)
+            elif kind == "UpdateOne":
+                result = self._update(request._filter, request._doc, request._upsert, many=False)
+            else:
+                raise NotImplementedError(f"bulk request {kind}")
+            modified += result.modified_count
+            upserted += result.upserted_id is not None
+        return SimpleNamespace(deleted_count=deleted, modified_count=modified, upserted_count=upserted)
+
+    async def create_index(self, *args, **kwargs):
+        return None
+
+
+def use_memory_db(master):
+    """
+    Point every motor collection on `master` at a MemoryCollection (aliases
+    like `col` keep sharing theirs) and empty its caches. Returns
+    {attribute name: MemoryCollection}.
+    """
+    replaced, collections = {}, {}
+    for name, value in list(vars(master).items()):
+        if isinstance(value, (AsyncIOMotorCollection, MemoryCollection)):
+            memory = replaced.setdefault(id(value), MemoryCollection(value.name))
+            setattr(master, name, memory)
+            collections[name] = memory
+    master.pref_cache.data.clear()
+    master.fsub_cache.data.clear()
+    return collections
@@ -0,0 +1,344 @@
+"""
+Multi-user load generator for the ingest path.
+
+Many users each open a session and forward files at a steady rate, all
+at once. The updates go through the registered pyrogram handlers the way
+the real dispatcher runs them: plugins are loaded in pyrogram's order,
+TG_BOT_WORKERS worker tasks pull updates off one queue, and each one
+checks handlers group by group and runs the first one whose filters
+match. Telegram is a FakeClient and Mongo is in memory; everything else,
+including the debounce timers and session write-behind, is the real code
+on a real event loop.
+
+Reported: queue wait and handler latency percentiles, event-loop lag,
+peak task count, and the size of user_sessions / pending_notifications
+before, right after ingest, and once the debounced notifications have
+gone out. Any error logged during the run is counted in the report and
+makes the run exit with status 1, since the numbers then describe the
+error path.
+
+Usage:
+    python benchmarks/loadgen.py [--users 500] [--files 200] [--rate 5] [--ramp 2]
+                                 [--workers 10000] [--latency 0.05] [--no-flood]
+                                 [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from importlib import import_module
+from types import SimpleNamespace
+
+# config.py requires these at import time
+for key, value in {"APP_ID": "0", "OWNER_ID": "7", "DATABASE_CHANNEL": "0",
+                   "DB_URI": "mongodb://localhost:27017", "DB_NAME": "bench"}.items():
+    os.environ.setdefault(key, value)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pyrogram.handlers import MessageHandler
+
+from corpus import make_filenames
+from fakes import ErrorCounter, FakeClient, FloodModel, use_memory_db
+from config import TG_BOT_WORKERS
+from Database.database import Seishiro
+from Plugins.bans import ban_list
+from Plugins.membership import membership
+from Plugins.Sequence import pending_notifications, user_sessions
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_DEBOUNCE = 2.3   # collect_files' notification delay
+
+
+# ==================== DISPATCH ====================
+
+def load_message_handlers(root="Plugins"):
+    """Message handlers by group, in the order Client.load_plugins registers them."""
+    groups = defaultdict(list)
+    for current_root, _, filenames in os.walk(os.path.join(ROOT, root)):
+        namespace = os.path.relpath(current_root, ROOT).replace("/", ".").replace("\\", ".")
+        if "__pycache__" in namespace:
+            continue
+        for filename in filenames:
+            if not filename.endswith(".py"):
+                continue
+            module = import_module(f"{namespace}.{filename[:-3]}")
+            for name in vars(module).keys():
+                for handler, group in getattr(getattr(module, name), "handlers", None) or ():
+                    if isinstance(handler, MessageHandler) and isinstance(group, int):
+                        groups[group].append(handler)
+    return [groups[group] for group in sorted(groups)]
+
+
+async def dispatch(client, groups, message):
+    """Run the first matching handler of each group, as pyrogram's Dispatcher does. Returns its name."""
+    handled = None
+    for group in groups:
+        for handler in group:
+            try:
+                if not await handler.check(client, message):
+                    continue
+            except Exception as e:
+                logger.error(f"Error checking filters: {e}")
+                continue
+            # handler.callback is what the Dispatcher calls: pyrofork's listener
+            # wrapper, which then runs the plugin function. That function is
+            # kept on original_callback and names the handler in the report.
+            name = handler.original_callback.__name__
+            try:
+                await handler.callback(client, message)
+            except Exception as e:
+                logger.error(f"Error in {name}: {e}")
+            handled = handled or name
+            break
+    return handled
+
+
+async def worker(queue, client, groups, samples):
+    while True:
+        item = await queue.get()
+        try:
+            if item is None:
+                return
+            message, enqueued = item
+            started = time.perf_counter()
+            name = await dispatch(client, groups, message)
+            finished = time.perf_counter()
+            samples[name or "unhandled"].append((started - enqueued, finished - started))
+        finally:
+            queue.task_done()
+
+
+# ==================== LOAD ====================
+
+def document(user_id, msg_id, filename):
+    return SimpleNamespace(file_name=filename, file_id=f"BQAD{user_id}_{msg_id}",
+                           file_unique_id=f"U{user_id}_{msg_id}", file_size=1024 * 1024)
+
+
+async def user_load(client, queue, user_id, files, rate, ramp, rng):
+    """One user: /ssequence, then `files` documents at `rate` per second."""
+    await asyncio.sleep(rng.uniform(0, ramp))
+    await queue.put((client.message(user_id, text="/ssequence"), time.perf_counter()))
+    interval = 1 / rate if rate > 0 else 0
+    next_at = time.perf_counter()
+    for msg_id, filename in enumerate(make_filenames(files, seed=user_id), start=1):
+        next_at += interval
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        message = client.message(user_id, msg_id=msg_id, document=document(user_id, msg_id, filename))
+        await queue.put((message, time.perf_counter()))
+
+
+# ==================== MEASUREMENT ====================
+
+class Monitor:
+    """Samples event-loop lag, task count and the session dicts' lengths."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lags = []
+        self.peak_tasks = 0
+        self.peak_sessions = 0
+        self.peak_pending = 0
+        self.skip = False   # set around our own blocking snapshots
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            if self.skip:
+                self.skip = False
+                continue
+            self.lags.append(time.perf_counter() - started - self.interval)
+            self.peak_tasks = max(self.peak_tasks, len(asyncio.all_tasks()))
+            self.peak_sessions = max(self.peak_sessions, len(user_sessions))
+            self.peak_pending = max(self.peak_pending, len(pending_notifications))
+
+
+def percentiles(values, points=(50, 90, 99)):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {f"p{p}": ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))] for p in points}
+    result["max"] = ordered[-1]
+    return {key: round(value * 1000, 3) for key, value in result.items()}   # ms
+
+
+def deep_size(root):
+    """
+    Bytes held by `root`: containers and the Sequence module's own objects
+    are followed, anything else (timers, messages, the client) counts
+    shallow so one stray reference doesn't pull in the whole process.
+    """
+    seen, stack, total = set(), [root], 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+        elif type(obj).__module__ == "Plugins.Sequence":
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return total
+
+
+def snapshot(monitor=None):
+    if monitor is not None:
+        monitor.skip = True
+    return {
+        "sessions": len(user_sessions),
+        "sessions_bytes": deep_size(user_sessions),
+        "queued_files": sum(len(s['files']) for s in user_sessions.values()),
+        "pending_notifications": len(pending_notifications),
+        "pending_notifications_bytes": deep_size(pending_notifications),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+async def drive(args, feed):
+    """
+    Set up the fakes and dispatcher workers, await feed(client, queue) to
+    enqueue (message, enqueued_at) pairs, wait for them and the debounced
+    notifications, and return the measurements. Shared with replay.py.
+    """
+    use_memory_db(Seishiro)
+    ban_list.banned = {}
+    membership.clear()
+    flood = None if args.no_flood else FloodModel()
+    client = FakeClient(latency=args.latency, jitter=args.jitter, flood=flood)
+    groups = load_message_handlers()
+
+    memory = {"before": snapshot()}
+    queue = asyncio.Queue()
+    samples = defaultdict(list)
+    workers = [asyncio.create_task(worker(queue, client, groups, samples)) for _ in range(args.workers)]
+    monitor = Monitor(args.lag_interval)
+    monitor_task = asyncio.create_task(monitor.run())
+
+    started = time.perf_counter()
+    await feed(client, queue)
+    await queue.join()
+    ingest_seconds = time.perf_counter() - started
+    memory["after_ingest"] = snapshot(monitor)
+
+    # Let the debounced notifications fire (and retry through any FloodWait)
+    await asyncio.sleep(NOTIFY_DEBOUNCE + 0.5)
+    while pending_notifications and time.perf_counter() - started < ingest_seconds + args.settle:
+        await asyncio.sleep(0.5)
+    memory["after_notify"] = snapshot(monitor)
+
+    monitor_task.cancel()
+    for _ in workers:
+        queue.put_nowait(None)
+    await asyncio.gather(*workers)
+
+    updates = sum(len(v) for v in samples.values())
+    return {
+        "updates": updates,
+        "ingest_seconds": round(ingest_seconds, 3),
+        "updates_per_second": round(updates / ingest_seconds, 1),
+        "handlers": {
+            name: {
+                "count": len(values),
+                "queue_wait_ms": percentiles([wait for wait, _ in values]),
+                "handler_ms": percentiles([duration for _, duration in values]),
+            }
+            for name, values in samples.items()
+        },
+        "loop_lag_ms": percentiles(monitor.lags, (50, 99)),
+        "peak_tasks": monitor.peak_tasks,
+        "peak_sessions": monitor.peak_sessions,
+        "peak_pending_notifications": monitor.peak_pending,
+        "memory": memory,
+        "telegram": {
+            "calls": dict(client.calls),
+            "floodwaits": dict(client.floodwaits),
+        },
+    }
+
+
+async def run(args):
+    rng = random.Random(0)
+
+    async def feed(client, queue):
+        await asyncio.gather(*(
+            user_load(client, queue, user_id, args.files, args.rate, args.ramp, rng)
+            for user_id in range(1000, 1000 + args.users)
+        ))
+
+    return await drive(args, feed)
+
+
+def write_report(report, output, errors):
+    """Print or save the JSON report; exit with status 1 if anything logged an error."""
+    report["results"]["errors"] = errors.report()
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if errors.counts:
+        sys.exit(f"{sum(errors.counts.values())} error(s) logged during the run, first: {errors.samples[0]}")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--files", type=int, default=200, help="files per user")
+    parser.add_argument("--rate", type=float, default=5, help="files per second per user (0 = as fast as possible)")
+    parser.add_argument("--ramp", type=float, default=2, help="users start at random within this many seconds")
+    parser.add_argument("--workers", type=int, default=TG_BOT_WORKERS)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--no-flood", action="store_true", help="no Telegram rate limits")
+    parser.add_argument("--lag-interval", type=float, default=0.01)
+    parser.add_argument("--settle", type=float, default=60, help="max seconds to wait for notifications")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own logging")
+    args = parser.parse_args()
+
+    errors = ErrorCounter().install(args.verbose)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "results": asyncio.run(run(args)),
+    }
+    write_report(report, args.output, errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Replay a recorded update stream through the plugin handlers.
+
+Reads a log written by Plugins/recorder.py (set UPDATE_RECORD_FILE on the
+bot) and feeds the messages through the same dispatcher, fakes and
+measurements as loadgen.py. It can run at the original pace, faster, or
+as fast as the handlers take them, so real traffic shapes (forward bursts,
+/esequence spikes) can be profiled offline. File ids aren't recorded, so
+replayed media get synthetic ones.
+
+The log holds user ids and message texts: treat it like the database.
+
+Usage:
+    python benchmarks/replay.py updates.jsonl.gz [--speed 1] [--limit N]
+                                [--workers 10000] [--latency 0.05] [--no-flood]
+                                [--output results.json]
+
+--speed 10 plays ten times faster than recorded; --speed 0 enqueues
+everything at once.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import platform
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from loadgen import drive, git_commit, write_report   # sets up the config environment and sys.path
+from fakes import ErrorCounter, FakeMessage
+from config import TG_BOT_WORKERS
+
+
+def read_log(path, limit=None):
+    """Recorded messages in arrival order. A truncated last gzip member (bot still writing) is tolerated."""
+    records = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                records.append(json.loads(line))
+                if limit and len(records) >= limit:
+                    break
+    except (EOFError, OSError, zlib.error, json.JSONDecodeError):
+        pass
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+def rebuild(client, record):
+    """A FakeMessage carrying what the recorder kept."""
+    user_id = record.get("user")
+    chat_id = record.get("chat") or user_id
+    message = FakeMessage(client, chat_id, record["id"], user_id=user_id, text=record.get("text"))
+    message.caption = record.get("caption")
+    kind = record.get("media")
+    if kind:
+        setattr(message, kind, SimpleNamespace(
+            file_name=record.get("file_name"),
+            file_id=f"replay_{chat_id}_{record['id']}",
+            file_unique_id=f"replay_{chat_id}_{record['id']}",
+            file_size=record.get("file_size"),
+        ))
+    if record.get("reply_to"):
+        message.reply_to_message = FakeMessage(client, chat_id, record["reply_to"], user_id=user_id, text="replayed")
+    return message
+
+
+async def play(records, speed, client, queue):
+    """Enqueue the records, keeping their original spacing divided by `speed`."""
+    if not records:
+        return
+    first = records[0]["ts"]
+    started = time.perf_counter()
+    for record in records:
+        if speed > 0:
+            delay = (record["ts"] - first) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await queue.put((rebuild(client, record), time.perf_counter()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("log", help="gzip'd JSON-lines file written by the bot's recorder")
+    parser.add_argument("--speed", type=float, default=1, help="pace multiplier; 0 = as fast as possible")
+    parser.add_argument("--limit", type=int, help="replay only the first N records")
+    parser.add_argument("--workers", type=int, default=TG_BOT_WORKERS)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--no-flood", action="store_true", help="no Telegram rate limits")
+    parser.add_argument("--lag-interval", type=float, default=0.01)
+    parser.add_argument("--settle", type=float, default=60, help="max seconds to wait for notifications")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own logging")
+    args = parser.parse_args()
+
+    errors = ErrorCounter().install(args.verbose)
+
+    records = read_log(args.log, args.limit)
+    if not records:
+        sys.exit(f"No updates in {args.log}")
+    recorded_seconds = records[-1]["ts"] - records[0]["ts"]
+
+    results = asyncio.run(drive(args, lambda client, queue: play(records, args.speed, client, queue)))
+    results["recorded_updates"] = len(records)
+    results["recorded_seconds"] = round(recorded_seconds, 3)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    write_report(report, args.output, errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,17 @@ from pyrogram import Client
 from pyrogram.enums import ParseMode
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, BotCommand
 from config import *
+from Database.database import Seishiro
 from Plugins.route import web_server
+from Plugins.admins import admin_set
+from Plugins.bans import ban_list
+from Plugins.broadcast import resume_broadcasts
+from Plugins.leaderboard import leaderboard
+from Plugins.metrics import instrument
+from Plugins.tracing import tracer
+from Plugins.recorder import recorder
+from Plugins.scheduler import send_scheduler
+from Plugins.sessions import session_store
 import pyrogram.utils
 from aiohttp import web
 
@@ -29,6 +39,8 @@ class Bot(Client):
     async def start(self, *args, **kwargs):
         await super().start()
         usr_bot_me = await self.get_me()
+        # Handlers are registered by now; time them, Master and every RPC for /metrics
+        instrument(self, Seishiro)
         self.uptime = datetime.now()
         
         # Set bot commands
@@ -38,6 +50,7 @@ class Bot(Client):
                 BotCommand("ssequence", "sᴛᴀʀᴛ sᴇǫᴜᴇɴᴄɪɴɢ ꜰɪʟᴇs"),
                 BotCommand("esequence", "ᴇɴᴅ sᴇǫᴜᴇɴᴄɪɴɢ ᴀɴᴅ sᴇɴᴅ"),
                 BotCommand("mode", "ᴄʜᴀɴɢᴇ sᴏʀᴛɪɴɢ ᴍᴏᴅᴇ"),
+                BotCommand("delivery", "ᴄʜᴀɴɢᴇ ᴅᴇʟɪᴠᴇʀʏ ᴍᴏᴅᴇ"),
                 BotCommand("cancel", "ᴄᴀɴᴄᴇʟ ᴄᴜʀʀᴇɴᴛ sᴇǫᴜᴇɴᴄᴇ"),
                 BotCommand("add_dump", "sᴇᴛ ᴅᴜᴍᴘ ᴄʜᴀɴɴᴇʟ"),
                 BotCommand("rem_dump", "ʀᴇᴍᴏᴠᴇ ᴅᴜᴍᴘ ᴄʜᴀɴɴᴇʟ"),
@@ -49,6 +62,8 @@ class Bot(Client):
                 BotCommand("ban", "ʙᴀɴ ᴜsᴇʀ (ᴏɴʟʏ ᴀᴅᴍɪɴs)"),
                 BotCommand("unban", "ᴜɴʙᴀɴ ᴜsᴇʀ (ᴏɴʟʏ ᴀᴅᴍɪɴs)"),
                 BotCommand("banned", "ʟɪsᴛ ʙᴀɴɴᴇᴅ ᴜsᴇʀs (ᴏɴʟʏ ᴀᴅᴍɪɴs)"),
+                BotCommand("bcast", "ᴍᴀɴᴀɢᴇ ʙʀᴏᴀᴅᴄᴀsᴛs (ᴏɴʟʏ ᴀᴅᴍɪɴs)"),
+                BotCommand("traces", "sʟᴏᴡᴇsᴛ ʀᴇᴄᴇɴᴛ ᴜᴘᴅᴀᴛᴇs (ᴏɴʟʏ ᴀᴅᴍɪɴs)"),
                 BotCommand("fsub_mode", "ᴄʜᴀɴɢᴇ ꜰsᴜʙ ᴍᴏᴅᴇ (ᴏɴʟʏ ᴀᴅᴍɪɴs)"),
                 BotCommand("addchnl", "ᴀᴅᴅ ꜰsᴜʙ ᴄʜᴀɴɴᴇʟ (ᴏɴʟʏ ᴀᴅᴍɪɴs)"),
                 BotCommand("delchnl", "ʀᴇᴍᴏᴠᴇ ꜰsᴜʙ ᴄʜᴀɴɴᴇʟ (ᴏɴʟʏ ᴀᴅᴍɪɴs)"),
@@ -71,6 +86,43 @@ class Bot(Client):
             print(f"Error sending restart notification: {e}")
        
         self.username = usr_bot_me.username
+
+        # Restore send rates learned from earlier FloodWaits
+        try:
+            await send_scheduler.load_rates()
+        except Exception as e:
+            print(f"Error loading send rates: {e}")
+
+        # Keep admins in memory so the admin filter never hits Mongo
+        try:
+            await admin_set.load()
+        except Exception as e:
+            print(f"Error loading admins: {e}")
+
+        # Keep the ban list in memory so check_ban never hits Mongo
+        try:
+            await ban_list.load()
+        except Exception as e:
+            print(f"Error loading ban list: {e}")
+
+        # Index and warm the leaderboard so /leaderboard never scans users
+        try:
+            await Seishiro.ensure_indexes()
+            await leaderboard.load()
+        except Exception as e:
+            print(f"Error loading leaderboard: {e}")
+
+        # Find sequence sessions that survived the restart
+        try:
+            await session_store.warm()
+        except Exception as e:
+            print(f"Error loading saved sessions: {e}")
+
+        # Pick up broadcasts interrupted by the restart
+        try:
+            await resume_broadcasts(self)
+        except Exception as e:
+            print(f"Error resuming broadcasts: {e}")
        
         # Web-response
         try:
@@ -82,6 +134,14 @@ class Bot(Client):
             print(f"Error starting web server: {e}")
            
     async def stop(self, *args):
+        await tracer.flush()
+        await recorder.flush()
+
+        # Write out buffered session changes before going down
+        try:
+            await session_store.flush()
+        except Exception as e:
+            print(f"Error flushing sessions: {e}")
         await super().stop()
        
 if __name__ == "__main__":
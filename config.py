@@ -21,6 +21,64 @@ LOG_FILE_NAME = "links-sharingbot.txt"
 SEASON_PATTERN = r'[Ss](\d{1,2})'
 EPISODE_PATTERN = r'[Ee][Pp]?(\d{1,3})'
 QUALITY_PATTERN = r'(480p|720p|1080p|HDRip|2k|4k)'
+PARSER_CACHE_SIZE = int(os.environ.get("PARSER_CACHE_SIZE", "8192"))
+VECTOR_SORT_THRESHOLD = int(os.environ.get("VECTOR_SORT_THRESHOLD", "5000"))
+
+# Outbound send budgets (requests per second)
+SEND_GLOBAL_RATE = float(os.environ.get("SEND_GLOBAL_RATE", "25"))
+SEND_PRIVATE_RATE = float(os.environ.get("SEND_PRIVATE_RATE", "1"))
+SEND_CHANNEL_RATE = float(os.environ.get("SEND_CHANNEL_RATE", "0.33"))
+SEND_CHAT_BURST = int(os.environ.get("SEND_CHAT_BURST", "5"))
+SEND_MIN_RATE = float(os.environ.get("SEND_MIN_RATE", "0.05"))
+SEND_PROBE_INTERVAL = int(os.environ.get("SEND_PROBE_INTERVAL", "60"))
+
+# Write-behind persistence of sequence sessions
+SESSION_FLUSH_INTERVAL = float(os.environ.get("SESSION_FLUSH_INTERVAL", "2"))
+SESSION_FLUSH_SIZE = int(os.environ.get("SESSION_FLUSH_SIZE", "500"))
+
+# How often (seconds) the in-memory ban list is reconciled with Mongo
+BAN_SYNC_INTERVAL = int(os.environ.get("BAN_SYNC_INTERVAL", "300"))
+
+# Force-sub caches (seconds): channel list/modes, confirmed members, non-members
+FSUB_CHANNEL_TTL = int(os.environ.get("FSUB_CHANNEL_TTL", "300"))
+FSUB_MEMBER_TTL = int(os.environ.get("FSUB_MEMBER_TTL", "600"))
+FSUB_NONMEMBER_TTL = int(os.environ.get("FSUB_NONMEMBER_TTL", "30"))
+FSUB_REQUEST_TTL = int(os.environ.get("FSUB_REQUEST_TTL", "60"))   # pending join requests
+FSUB_CACHE_SIZE = int(os.environ.get("FSUB_CACHE_SIZE", "100000"))
+# Invite links are replaced this many seconds before they expire
+FSUB_LINK_MARGIN = int(os.environ.get("FSUB_LINK_MARGIN", "60"))
+# How long channel titles/usernames are cached for the fsub prompt
+CHAT_DATA_TTL = int(os.environ.get("CHAT_DATA_TTL", "3600"))
+# Max concurrent Telegram calls while checking / building the fsub prompt
+FSUB_CONCURRENCY = int(os.environ.get("FSUB_CONCURRENCY", "8"))
+# Seconds after the fsub prompt before a join-request channel is checked
+# again; a user's blocked messages then run if they have joined
+FSUB_RECHECK_DELAY = int(os.environ.get("FSUB_RECHECK_DELAY", "30"))
+# Blocked messages held per user and command for that re-check
+FSUB_HOLD_LIMIT = int(os.environ.get("FSUB_HOLD_LIMIT", "200"))
+
+# How often (seconds) the in-memory admin set is re-read from Mongo
+ADMIN_SYNC_INTERVAL = int(os.environ.get("ADMIN_SYNC_INTERVAL", "300"))
+
+# Per-user preference cache (sequence mode, delivery mode, dump channel)
+PREF_CACHE_SIZE = int(os.environ.get("PREF_CACHE_SIZE", "50000"))
+PREF_CACHE_TTL = int(os.environ.get("PREF_CACHE_TTL", "3600"))
+
+# Broadcast engine: concurrent senders, cursor batch size, seconds between progress edits
+BROADCAST_WORKERS = int(os.environ.get("BROADCAST_WORKERS", "20"))
+BROADCAST_BATCH_SIZE = int(os.environ.get("BROADCAST_BATCH_SIZE", "1000"))
+BROADCAST_PROGRESS_INTERVAL = float(os.environ.get("BROADCAST_PROGRESS_INTERVAL", "10"))
+
+# Update tracing: share of updates traced, JSON-lines export file ("" = off), traces kept for /traces
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.05"))
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+TRACE_KEEP = int(os.environ.get("TRACE_KEEP", "500"))
+
+# Update recording for offline replay: gzip'd JSON-lines file ("" = off); metadata and file names only, no media
+UPDATE_RECORD_FILE = os.environ.get("UPDATE_RECORD_FILE", "")
+
+# Resolution (seconds) of the shared timer wheel for debounces and delayed jobs
+TIMER_TICK = float(os.environ.get("TIMER_TICK", "0.1"))
 
 TEMP_DIR = "temp_files"
 if not os.path.exists(TEMP_DIR):